@@ -1,26 +1,71 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
-from best_colleges import get_best_colleges_by_course, get_states, get_courses as get_best_courses
-from rank_predictor import predict_rank
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, Response, stream_template
+from best_colleges import (
+    get_states,
+    refresh_college_scores,
+    refresh_state_rollups,
+    refresh_search_index,
+    get_best_colleges_page,
+    compare_colleges,
+    get_state_overview,
+    STATE_OVERVIEW_ORDER,
+    count_best_colleges,
+    iter_best_colleges,
+    search as search_index,
+    SEARCH_KINDS,
+    SEARCH_SOURCES,
+    COLUMNS as BEST_COLLEGE_COLUMNS,
+)
+from rank_predictor import (
+    predict_rank_for_score,
+    predict_rank_band,
+    predict_ranks_for_scores,
+    min_score_for_ranks,
+    ENGINES,
+    DEFAULT_ENGINE,
+)
+from rank_distribution import get_rank_distribution, MAX_WINDOW
 import course_predictor
-from logic_main import generate_main_timetable
-from logic_revision import generate_revision_timetable
-from models import get_db_connection, TIMETABLE_DB, REV_TIMETABLE_DB
+import counselling_report
+import lookup_cache
+from timetable_data import (parse_timetable_form, parse_export_range, plan_stats, LazyTimetable,
+                            month_payload, build_timetable, export_filename)
+import timetable_export
+import pdf_cache
 import pdf_generator
-from datetime import datetime, date, timedelta
+import pdf_jobs
+import response_compression
+from datetime import datetime
+import logging
+import time
+import numpy as np
 
 
 from db_init import (
     init_pyq_weightage_db, 
     init_revision_weightage_db, 
     init_created_timetable_db, 
-    init_revision_timetable_db
+    init_revision_timetable_db,
+    init_medical_allotment_indexes,
+    init_college_scores_db,
+    init_search_index_db
 )
 
-# Initialize databases to ensure tables exist
-init_pyq_weightage_db()
-init_revision_weightage_db()
-init_created_timetable_db()
-init_revision_timetable_db()
+# Initialize databases to ensure tables exist. PDF render processes spawned
+# under `python app.py` import this module again as __mp_main__ and skip it.
+if __name__ != "__mp_main__":
+    init_pyq_weightage_db()
+    init_revision_weightage_db()
+    init_created_timetable_db()
+    init_revision_timetable_db()
+    init_medical_allotment_indexes()
+    init_college_scores_db()
+    init_search_index_db()
+    # A failed rebuild is logged and retried on first use rather than stopping the server
+    for refresh in (refresh_college_scores, refresh_state_rollups, refresh_search_index):
+        try:
+            refresh()
+        except Exception:
+            logging.getLogger(__name__).exception("%s failed at startup", refresh.__name__)
 
 app = Flask(__name__)
 
@@ -28,6 +73,21 @@ app = Flask(__name__)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 
+# Largest mock-test batch accepted by /api/predict-rank/batch
+app.config['RANK_BATCH_MAX'] = 50000
+
+# Rows per page on /best-colleges and /api/best-colleges
+app.config['BEST_COLLEGES_PAGE_SIZE'] = 50
+app.config['BEST_COLLEGES_MAX_PAGE_SIZE'] = 200
+# Courses per /api/compare-colleges request
+app.config['COMPARE_MAX_COURSES'] = 10
+# Results per /api/search lookup (the default suits a typeahead)
+app.config['SEARCH_DEFAULT_LIMIT'] = 10
+app.config['SEARCH_MAX_LIMIT'] = 200
+
+# gzip/brotli for pages and API responses; precompressed copies for static files
+response_compression.init_app(app)
+
 #           ------   index page    ------   
 
 @app.route("/")
@@ -38,7 +98,6 @@ def home():
 
 @app.route("/coursepredict", methods=["GET", "POST"])
 def coursepredict():
-    courses = course_predictor.get_courses()
     categories = course_predictor.get_categories()
     selected_course = None
     selected_quota = None
@@ -65,7 +124,6 @@ def coursepredict():
                 eligible_courses = course_predictor.get_eligible_courses(my_rank, selected_quota, selected_category)
 
     return render_template("coursepredict.html",
-                           courses=courses,
                            categories=categories,
                            selected_course=selected_course,
                            selected_quota=selected_quota,
@@ -81,11 +139,18 @@ def get_quotas():
     quotas = course_predictor.get_quotas(course) if course else []
     return jsonify({"quotas": quotas})
 
+
+@app.route("/api/cache-stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters for the cached dropdown lists and the PDF cache"""
+    stats = lookup_cache.cache_stats()
+    stats["pdf"] = pdf_cache.cache_stats()
+    return jsonify(stats)
+
 #               ------   best colleges page   ------ 
 
 @app.route("/best-colleges", methods=["GET", "POST"])
 def best_colleges():
-    courses = get_best_courses()
     states = get_states()
 
     if request.method == "POST":
@@ -97,29 +162,137 @@ def best_colleges():
         state_filter = request.args.get("state_filter", '')
         top_n = 1000
 
+    # stream=1 renders the full list, flushing rows as they are read
+    stream = request.values.get("stream") == "1"
+
     error = None
-    table_html = None
+    colleges_data = []
+    next_cursor = None
+    total = 0
 
     if not course:
         error = "Please select a course to view colleges."
         course = None
 
     if course:
-        df = get_best_colleges_by_course(course, state_filter=state_filter or None, top_n=top_n)
-        if not df.empty:
-            # Convert dataframe to list of dicts for Jinja iteration
-            colleges_data = df.to_dict(orient='records')
-            # If the dataframe column names have spaces, we might need to be careful in jinja or rename them here.
-            # Assuming keys are 'Allotted Institute', 'Course', 'Allotted Quota', 'Rank', etc. from previous context.
-
-    return render_template("best_colleges.html",
-                           colleges=colleges_data if 'colleges_data' in locals() else [],
-                           error=error,
-                           courses=courses,
-                           states=states,
-                           selected_course=course,
-                           selected_state=state_filter,
-                           top_n=top_n)
+        state = state_filter or None
+        total = count_best_colleges(course, state_filter=state)
+        if stream:
+            # Row tuples in best_colleges.COLUMNS order, produced lazily
+            colleges_data = iter_best_colleges(course, state_filter=state, top_n=top_n)
+        else:
+            # First screen only; main.js fetches the rest from /api/best-colleges on scroll
+            colleges_data, next_cursor = get_best_colleges_page(
+                course, state_filter=state, limit=app.config['BEST_COLLEGES_PAGE_SIZE'])
+
+    context = dict(colleges=colleges_data,
+                   total=total,
+                   next_cursor=next_cursor,
+                   error=error,
+                   states=states,
+                   selected_course=course,
+                   selected_state=state_filter,
+                   top_n=top_n)
+    if stream and course:
+        return Response(stream_template("best_colleges.html", **context))
+    return render_template("best_colleges.html", **context)
+
+
+@app.route("/api/best-colleges", methods=["GET"])
+def best_colleges_api():
+    """Keyset-paginated best colleges: pass next_cursor back as cursor for the next page"""
+    course = request.args.get("course")
+    state_filter = request.args.get("state") or None
+    cursor = request.args.get("cursor") or None
+    if not course:
+        return jsonify({"error": "course is required."}), 400
+    try:
+        limit = int(request.args.get("limit", app.config['BEST_COLLEGES_PAGE_SIZE']))
+    except ValueError:
+        return jsonify({"error": "limit must be a whole number."}), 400
+    limit = max(1, min(limit, app.config['BEST_COLLEGES_MAX_PAGE_SIZE']))
+
+    try:
+        rows, next_cursor = get_best_colleges_page(course, state_filter=state_filter, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"columns": BEST_COLLEGE_COLUMNS, "rows": rows, "next_cursor": next_cursor})
+
+
+
+@app.route("/api/compare-colleges", methods=["GET"])
+def compare_colleges_api():
+    """Best-college rank and score for several courses side by side (?course=A&course=B&state=)"""
+    courses = [c for c in request.args.getlist("course") if c]
+    state_filter = request.args.get("state") or None
+    if not courses:
+        return jsonify({"error": "Provide at least one course."}), 400
+    if len(courses) > app.config['COMPARE_MAX_COURSES']:
+        return jsonify({"error": f"At most {app.config['COMPARE_MAX_COURSES']} courses per comparison."}), 400
+
+    return jsonify(compare_colleges(courses, state_filter=state_filter))
+
+
+@app.route("/api/state-overview", methods=["GET"])
+def state_overview_api():
+    """Seats, colleges and closing ranks per state for a course (?course=&quota=&sort=)"""
+    course = request.args.get("course")
+    quota = request.args.get("quota") or None
+    order_by = request.args.get("sort", "seats")
+    if not course:
+        return jsonify({"error": "course is required."}), 400
+    if order_by not in STATE_OVERVIEW_ORDER:
+        return jsonify({"error": f"sort must be one of {', '.join(STATE_OVERVIEW_ORDER)}"}), 400
+
+    return jsonify({"course": course, "quota": quota, "sort": order_by,
+                    "states": get_state_overview(course, quota=quota, order_by=order_by)})
+
+
+@app.route("/api/search", methods=["GET"])
+def search_api():
+    """
+    Typeahead over colleges (name, city, state) and courses (?q=&kind=&source=&limit=).
+    more is true when further matches were cut off by limit.
+    """
+    query = request.args.get("q", "")
+    kind = request.args.get("kind") or None
+    source = request.args.get("source") or None
+    if kind is not None and kind not in SEARCH_KINDS:
+        return jsonify({"error": f"kind must be one of {', '.join(SEARCH_KINDS)}"}), 400
+    if source is not None and source not in SEARCH_SOURCES:
+        return jsonify({"error": f"source must be one of {', '.join(SEARCH_SOURCES)}"}), 400
+    try:
+        limit = int(request.args.get("limit", app.config['SEARCH_DEFAULT_LIMIT']))
+    except ValueError:
+        return jsonify({"error": "limit must be a whole number."}), 400
+    limit = max(1, min(limit, app.config['SEARCH_MAX_LIMIT']))
+
+    results = search_index(query, kind=kind, limit=limit + 1, source=source)
+    return jsonify({"query": query, "results": results[:limit], "more": len(results) > limit})
+
+#                ------   counselling report    ------   
+
+@app.route('/api/counselling-report', methods=['GET'])
+def counselling_report_route():
+    """Score -> rank -> eligible courses -> best colleges, in one request"""
+    quota = request.args.get('quota')
+    category = request.args.get('category')
+    state = request.args.get('state') or None
+    engine = request.args.get('engine', DEFAULT_ENGINE)
+
+    try:
+        score = float(request.args.get('score', ''))
+    except ValueError:
+        return jsonify({"error": "score must be a number from 0 to 800."}), 400
+    if not (0 <= score <= 800):
+        return jsonify({"error": "score must be a number from 0 to 800."}), 400
+    if not quota or not category:
+        return jsonify({"error": "quota and category are required."}), 400
+    if engine not in ENGINES:
+        return jsonify({"error": f"engine must be one of {', '.join(ENGINES)}"}), 400
+
+    return jsonify(counselling_report.build_report(score, quota, category, state=state, engine=engine))
 
 
 #                ------   rank predictor page    ------   
@@ -127,6 +300,10 @@ def best_colleges():
 @app.route('/predict-rank', methods=['GET', 'POST'])
 def predict_rank_route():
     predicted_rank = None
+    rank_band = None
+    engine = request.values.get('engine', DEFAULT_ENGINE)
+    if engine not in ENGINES:
+        engine = DEFAULT_ENGINE
     if request.method == 'POST':
         try:
             score = float(request.form.get('score', -1))
@@ -134,13 +311,122 @@ def predict_rank_route():
             if not (0 <= score <= 800):
                 raise ValueError("Score out of valid range")
 
-            # Convert score to percentage
-            percentage = (score / 800) * 100
-            predicted_rank = predict_rank(percentage)
+            predicted_rank = predict_rank_for_score(score, engine=engine)
+            if engine == 'empirical':
+                rank_band = predict_rank_band(score, engine=engine)
         except Exception:
             predicted_rank = "Invalid input. Please enter a valid score from 0 to 800."
 
-    return render_template('predict_rank.html', predicted_rank=predicted_rank)
+    return render_template('predict_rank.html',
+                           predicted_rank=predicted_rank,
+                           rank_band=rank_band,
+                           engines=ENGINES,
+                           selected_engine=engine)
+
+
+MAX_INVERSE_TARGETS = 100
+
+def _target_rank(value):
+    """value as a target rank (an int of 1 or more), or None"""
+    # Strings (query values) must spell an integer; other values must be ints, not bools or floats
+    if isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    return value
+
+@app.route('/api/predict-rank/inverse', methods=['GET', 'POST'])
+def predict_rank_inverse():
+    """Minimum score needed for one or more target ranks"""
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+        raw_targets = payload.get('ranks', [])
+        engine = payload.get('engine', DEFAULT_ENGINE)
+    else:
+        raw_targets = request.args.getlist('rank')
+        engine = request.args.get('engine', DEFAULT_ENGINE)
+
+    if engine not in ENGINES:
+        return jsonify({"error": f"engine must be one of {', '.join(ENGINES)}"}), 400
+    if not isinstance(raw_targets, list) or not raw_targets:
+        return jsonify({"error": "Provide at least one target rank."}), 400
+    if len(raw_targets) > MAX_INVERSE_TARGETS:
+        return jsonify({"error": f"At most {MAX_INVERSE_TARGETS} target ranks per request."}), 400
+
+    targets = [_target_rank(t) for t in raw_targets]
+    if None in targets:
+        return jsonify({
+            "error": "Target ranks must be whole numbers of 1 or more.",
+            "invalid_indices": [i for i, t in enumerate(targets) if t is None][:20],
+        }), 400
+
+    return jsonify({"engine": engine, "results": min_score_for_ranks(targets, engine=engine)})
+
+
+def _is_batch_score(score):
+    # Same rule as /predict-rank: any number from 0 to 800 (NaN and infinities fail the range)
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        return False
+    return 0 <= score <= 800
+
+
+@app.route('/api/predict-rank/batch', methods=['POST'])
+def predict_rank_batch():
+    """Predict ranks for a whole batch of scores, returned in input order"""
+    payload = request.get_json(silent=True) or {}
+    scores = payload.get('scores')
+    engine = payload.get('engine', DEFAULT_ENGINE)
+
+    if engine not in ENGINES:
+        return jsonify({"error": f"engine must be one of {', '.join(ENGINES)}"}), 400
+    if not isinstance(scores, list) or not scores:
+        return jsonify({"error": "Provide a non-empty 'scores' array."}), 400
+    if len(scores) > app.config['RANK_BATCH_MAX']:
+        return jsonify({"error": f"At most {app.config['RANK_BATCH_MAX']} scores per batch."}), 400
+
+    started = time.perf_counter()
+
+    # Validate the whole batch before converting: numbers within 0-800 only.
+    # Range is checked on the Python values, so huge JSON integers never reach the float array
+    valid = np.fromiter((_is_batch_score(s) for s in scores), dtype=bool, count=len(scores))
+    if not valid.all():
+        invalid = np.flatnonzero(~valid)
+        return jsonify({
+            "error": "Scores must be numbers from 0 to 800.",
+            "invalid_count": int(invalid.size),
+            "invalid_indices": invalid[:20].tolist(),
+        }), 400
+
+    values = np.array(scores, dtype=float)
+    ranks = predict_ranks_for_scores(values, engine=engine)
+    elapsed = time.perf_counter() - started
+
+    return jsonify({
+        "engine": engine,
+        "count": len(scores),
+        "ranks": ranks.tolist(),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "scores_per_second": int(len(scores) / elapsed) if elapsed > 0 else None,
+    })
+
+
+@app.route('/api/rank-distribution', methods=['GET'])
+def rank_distribution():
+    """Observed rank histogram and min/median/max for scores near a given score"""
+    try:
+        score = int(request.args.get('score', ''))
+        window = int(request.args.get('window', 5))
+    except ValueError:
+        return jsonify({"error": "score and window must be whole numbers."}), 400
+    if not (0 <= score <= 800):
+        return jsonify({"error": "score must be from 0 to 800."}), 400
+    if not (0 <= window <= MAX_WINDOW):
+        return jsonify({"error": f"window must be from 0 to {MAX_WINDOW}."}), 400
+
+    return jsonify(get_rank_distribution().around(score, window))
 
 
 #                ------   timetable generator page    ------   
@@ -154,269 +440,150 @@ def timetable_form():
 @app.route('/generate-timetable', methods=['POST'])
 def generate_timetable():
     """Generate timetable using old project logic"""
-    # 1. Extract Inputs
-    from_date_str = request.form['from_date']
-    to_date_str = request.form['to_date']
-    revision_days = int(request.form.get('revision_days', 0))
-    daily_hours = int(request.form['daily_hours'])
-    selected_slots = request.form.getlist('time_slots') 
-    
-    gt_freq = request.form.get('grant_test_frequency', 'once_weekly')
-    method = request.form.get('method', 'subject_completion_wise')
-    
     # Simple validation
-    if not from_date_str or not to_date_str:
+    if not request.form.get('from_date') or not request.form.get('to_date'):
         return "Dates required", 400
-        
-    start_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
-    end_date = datetime.strptime(to_date_str, '%Y-%m-%d').date()
-    
-    total_days = (end_date - start_date).days + 1
-    
-    main_timetable_id = None
-    rev_timetable_id = None
-    
-    # 2. Logic Dispatch
-    if total_days <= 60:
-        # ONLY Revision Timetable
-        rev_timetable_id = generate_revision_timetable(start_date, end_date, selected_slots, daily_hours)
-    else:
-        # Both Main and Revision
-        main_days_count = total_days - revision_days
-        main_end = start_date + timedelta(days=main_days_count - 1)
-        rev_start = main_end + timedelta(days=1)
-        rev_end_actual = end_date - timedelta(days=1)
-        
-        # Generate Main
-        main_timetable_id = generate_main_timetable(start_date, main_end, selected_slots, gt_freq, method, revision_days)
-        
-        # Generate Revision
-        rev_timetable_id = generate_revision_timetable(rev_start, rev_end_actual, selected_slots, daily_hours)
-
-    # 3. Retrieve Data for Display
-    def process_data_matrix(timetable_id, is_revision=False):
-        if not timetable_id:
-            return {'days': [], 'summary': {}}
-            
-        table = 'TimetableSlots'
-        id_col = 'timetable_id' if not is_revision else 'rev_timetable_id'
-        
-        with get_db_connection(TIMETABLE_DB if not is_revision else REV_TIMETABLE_DB) as conn:
-            cur = conn.cursor()
-            cur.execute(f"SELECT * FROM {table} WHERE {id_col} = ? ORDER BY slot_date, start_time", (timetable_id,))
-            rows = cur.fetchall()
-            
-            # Summary
-            counts = {}
-            for r in rows:
-                s = r['subject']
-                if s not in counts: counts[s] = 0
-                counts[s] += 1
-            
-            sorted_summary = dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
-            
-            # Matrix Transformation
-            matrix_days = []
-            current_date = None
-            current_day_obj = None
-            
-            for r in rows:
-                r_dict = dict(r)
-                d_str = r_dict['slot_date']
-                
-                if d_str != current_date:
-                    if current_day_obj:
-                        matrix_days.append(current_day_obj)
-                    
-                    dt = datetime.strptime(d_str, '%Y-%m-%d')
-                    day_name = dt.strftime('%A')
-                    friendly_date = f"{d_str} ({day_name})"
-                    
-                    current_day_obj = {
-                        'date_display': friendly_date,
-                        'is_special': False,
-                        'special_label': '',
-                        'slots_map': {}
-                    }
-                    current_date = d_str
-                
-                subj = r_dict['subject']
-                time_key = f"{r_dict['start_time']}-{r_dict['end_time']}"
-                
-                if is_revision:
-                    if "Grand Test" in subj:
-                        current_day_obj['is_special'] = True
-                        current_day_obj['special_label'] = "Grand Test"
-                    elif "Weekly Revision" in subj:
-                        current_day_obj['is_special'] = True
-                        current_day_obj['special_label'] = "Weekly Revision"
-                
-                current_day_obj['slots_map'][time_key] = subj
-                
-            if current_day_obj:
-                matrix_days.append(current_day_obj)
-                
-            return {'days': matrix_days, 'summary': sorted_summary}
-
-    main_data = process_data_matrix(main_timetable_id, is_revision=False)
-    rev_data = process_data_matrix(rev_timetable_id, is_revision=True)
-    
-    # Calculate Duration Stats
-    stats = {}
-    total_d = (end_date - start_date).days + 1
-    stats['total_days'] = total_d
-    
-    if total_days <= 60:
-         stats['main_days'] = 0
-         stats['rev_days'] = total_d
-    else:
-         stats['main_days'] = (main_end - start_date).days + 1
-         stats['rev_days'] = (rev_end_actual - rev_start).days + 1 
 
-    cols = sorted(selected_slots) 
+    form_data = parse_timetable_form(request.form)
 
-    return render_template('timetable_result.html', 
-                         main=main_data, 
-                         rev=rev_data, 
-                         stats=stats, 
-                         time_cols=cols, 
+    # Streamed: the page head and stats go out before the plan is generated.
+    # Day rows are not in the page; main.js fetches them a month at a time
+    # from /api/timetable/<phase>/<id> as the schedule scrolls into view
+    return Response(stream_template('timetable_result.html', 
+                         plan=LazyTimetable(form_data), 
+                         stats=plan_stats(form_data), 
+                         time_cols=sorted(form_data['time_slots']), 
                          quotes=pdf_generator.MOTIVATIONAL_QUOTES,
-                         form_data={
-                             'from_date': from_date_str,
-                             'to_date': to_date_str,
-                             'revision_days': revision_days,
-                             'daily_hours': daily_hours,
-                             'time_slots': selected_slots,
-                             'grant_test_frequency': gt_freq,
-                             'method': method
-                         })
+                         form_data=form_data))
 
 
 @app.route('/download-timetable-pdf', methods=['POST'])
 def download_timetable_pdf():
-    """Generate and download enhanced PDF"""
+    """
+    Generate and download enhanced PDF. range_from/range_to or month limit it
+    to those days (summary=1 keeps the subject breakdown).
+    """
     try:
-        # Get form data (same as generate_timetable)
-        from_date_str = request.form['from_date']
-        to_date_str = request.form['to_date']
-        revision_days = int(request.form.get('revision_days', 0))
-        daily_hours = int(request.form['daily_hours'])
-        selected_slots = request.form.getlist('time_slots')
-        gt_freq = request.form.get('grant_test_frequency', 'once_weekly')
-        method = request.form.get('method', 'subject_completion_wise')
-        
-        start_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
-        end_date = datetime.strptime(to_date_str, '%Y-%m-%d').date()
-        total_days = (end_date - start_date).days + 1
-        
-        main_timetable_id = None
-        rev_timetable_id = None
-        
-        # Generate timetables (same logic)
-        if total_days <= 60:
-            rev_timetable_id = generate_revision_timetable(start_date, end_date, selected_slots, daily_hours)
-        else:
-            main_days_count = total_days - revision_days
-            main_end = start_date + timedelta(days=main_days_count - 1)
-            rev_start = main_end + timedelta(days=1)
-            rev_end_actual = end_date - timedelta(days=1)
-            
-            main_timetable_id = generate_main_timetable(start_date, main_end, selected_slots, gt_freq, method, revision_days)
-            rev_timetable_id = generate_revision_timetable(rev_start, rev_end_actual, selected_slots, daily_hours)
-        
-        # Process data (same helper function)
-        def process_data_matrix(timetable_id, is_revision=False):
-            if not timetable_id:
-                return {'days': [], 'summary': {}}
-                
-            table = 'TimetableSlots'
-            id_col = 'timetable_id' if not is_revision else 'rev_timetable_id'
-            
-            with get_db_connection(TIMETABLE_DB if not is_revision else REV_TIMETABLE_DB) as conn:
-                cur = conn.cursor()
-                cur.execute(f"SELECT * FROM {table} WHERE {id_col} = ? ORDER BY slot_date, start_time", (timetable_id,))
-                rows = cur.fetchall()
-                
-                counts = {}
-                for r in rows:
-                    s = r['subject']
-                    if s not in counts: counts[s] = 0
-                    counts[s] += 1
-                
-                sorted_summary = dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
-                
-                matrix_days = []
-                current_date = None
-                current_day_obj = None
-                
-                for r in rows:
-                    r_dict = dict(r)
-                    d_str = r_dict['slot_date']
-                    
-                    if d_str != current_date:
-                        if current_day_obj:
-                            matrix_days.append(current_day_obj)
-                        
-                        dt = datetime.strptime(d_str, '%Y-%m-%d')
-                        day_name = dt.strftime('%A')
-                        friendly_date = f"{d_str} ({day_name})"
-                        
-                        current_day_obj = {
-                            'date_display': friendly_date,
-                            'is_special': False,
-                            'special_label': '',
-                            'slots_map': {}
-                        }
-                        current_date = d_str
-                    
-                    subj = r_dict['subject']
-                    time_key = f"{r_dict['start_time']}-{r_dict['end_time']}"
-                    
-                    if is_revision:
-                        if "Grand Test" in subj:
-                            current_day_obj['is_special'] = True
-                            current_day_obj['special_label'] = "Grand Test"
-                        elif "Weekly Revision" in subj:
-                            current_day_obj['is_special'] = True
-                            current_day_obj['special_label'] = "Weekly Revision"
-                    
-                    current_day_obj['slots_map'][time_key] = subj
-                    
-                if current_day_obj:
-                    matrix_days.append(current_day_obj)
-                    
-                return {'days': matrix_days, 'summary': sorted_summary}
-        
-        main_data = process_data_matrix(main_timetable_id, is_revision=False)
-        rev_data = process_data_matrix(rev_timetable_id, is_revision=True)
-        
-        stats = {}
-        total_d = (end_date - start_date).days + 1
-        stats['total_days'] = total_d
-        
-        if total_days <= 60:
-             stats['main_days'] = 0
-             stats['rev_days'] = total_d
-        else:
-             stats['main_days'] = (main_end - start_date).days + 1
-             stats['rev_days'] = (rev_end_actual - rev_start).days + 1
-        
-        cols = sorted(selected_slots)
+        export_range = parse_export_range(request.form)
+    except ValueError as e:
+        return f"Invalid export range: {str(e)}", 400
+
+    try:
+        form_data = parse_timetable_form(request.form)
+        try:
+            main_data, rev_data, stats, cols = build_timetable(form_data, export_range)
+        except ValueError as e:
+            return str(e), 400
         
-        # Generate enhanced PDF
-        pdf_buffer = pdf_generator.generate_pdf(main_data, rev_data, stats, cols)
+        # Rendered once per distinct timetable, then served from the disk cache.
+        # The PDF is written to and read back from disk and sent in chunks,
+        # so the worker never holds a second copy of the document in memory.
+        pdf_file = pdf_cache.open_pdf(main_data, rev_data, stats, cols)
         
         return send_file(
-            pdf_buffer,
+            pdf_file,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f'NEET_PG_Timetable_{from_date_str}_to_{to_date_str}.pdf'
+            download_name=export_filename(form_data, export_range)
         )
         
     except Exception as e:
         return f"Error generating PDF: {str(e)}", 500
 
 
+@app.route('/api/timetable/<phase>/<int:timetable_id>', methods=['GET'])
+def timetable_month(phase, timetable_id):
+    """One month (?month=YYYY-MM, default the first) of a generated timetable in compact form"""
+    if phase not in ('main', 'revision'):
+        return jsonify({"error": "phase must be main or revision."}), 404
+    try:
+        payload = month_payload(timetable_id, is_revision=phase == 'revision',
+                                month=request.args.get('month'))
+    except ValueError:
+        return jsonify({"error": "month must be YYYY-MM."}), 400
+    if payload is None:
+        return jsonify({"error": "Timetable not found."}), 404
+    return jsonify(payload)
+
+
+#                ------   calendar and spreadsheet exports    ------   
+
+EXPORT_FORMATS = {
+    'ics': ('text/calendar; charset=utf-8', timetable_export.iter_ics),
+    'csv': ('text/csv; charset=utf-8', timetable_export.iter_csv),
+}
+
+@app.route('/export-timetable.<fmt>', methods=['GET'])
+def export_timetable(fmt):
+    """
+    Stream a generated timetable as ICS (one event per subject block) or CSV
+    (one row per slot): /export-timetable.ics?main_id=&rev_id=
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": "Format must be ics or csv."}), 404
+    main_id = request.args.get('main_id', type=int)
+    rev_id = request.args.get('rev_id', type=int)
+    if not timetable_export.timetable_exists(main_id, rev_id):
+        return jsonify({"error": "Timetable not found."}), 404
+
+    mimetype, generate = EXPORT_FORMATS[fmt]
+    return Response(generate(main_id, rev_id), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=NEET_PG_Timetable.{fmt}",
+    })
+
+
+#                ------   background PDF exports    ------   
+
+@app.route('/api/timetable-pdf/jobs', methods=['POST'])
+def submit_pdf_job():
+    """
+    Queue a PDF export for the posted timetable options (and optional export
+    range, as for /download-timetable-pdf); poll status_url until done
+    """
+    try:
+        form_data = parse_timetable_form(request.form)
+        datetime.strptime(form_data['from_date'], '%Y-%m-%d')
+        datetime.strptime(form_data['to_date'], '%Y-%m-%d')
+    except (KeyError, ValueError):
+        return jsonify({"error": "from_date, to_date (YYYY-MM-DD) and daily_hours are required."}), 400
+    try:
+        export_range = parse_export_range(request.form)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid export range: {e}"}), 400
+
+    try:
+        state = pdf_jobs.submit_job(form_data, export_range)
+    except pdf_jobs.ExportUnavailable as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    return jsonify(_pdf_job_response(state)), 202
+
+
+@app.route('/api/timetable-pdf/jobs/<job_id>', methods=['GET'])
+def pdf_job_status(job_id):
+    state = pdf_jobs.job_status(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(_pdf_job_response(state))
+
+
+@app.route('/api/timetable-pdf/jobs/<job_id>/download', methods=['GET'])
+def pdf_job_download(job_id):
+    state = pdf_jobs.job_status(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown job."}), 404
+    path = pdf_jobs.job_pdf_path(job_id)
+    if path is None:
+        return jsonify({"error": f"Job is {state['status']}."}), 409
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=state['download_name'])
+
+
+def _pdf_job_response(state):
+    return dict(state,
+                status_url=url_for('pdf_job_status', job_id=state['id']),
+                download_url=url_for('pdf_job_download', job_id=state['id']))
+
 
 if __name__ == "__main__":
     app.run()
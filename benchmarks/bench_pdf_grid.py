@@ -0,0 +1,39 @@
+"""
+Build time of pdf_generator.generate_pdf with the ScheduleGrid renderer
+against the Table-of-Paragraphs path (fast_grid=False).
+
+Run from the repository root:
+    python benchmarks/bench_pdf_grid.py
+"""
+
+import os
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_generator
+from bench_pdf_memory import TIME_COLS, synthetic_plan
+
+
+def main():
+    print(f"{'pages':>6} {'table s':>8} {'grid s':>8} {'speedup':>8}")
+    for pages in (36, 100, 200):
+        main_days = pages * 12
+        main_data = synthetic_plan(main_days)
+        rev_data = synthetic_plan(60, start=date(2026, 1, 1) + timedelta(days=main_days))
+        stats = {"total_days": main_days + 60, "main_days": main_days, "rev_days": 60}
+
+        def build(fast_grid):
+            random.seed(0)
+            pdf_generator.generate_pdf(main_data, rev_data, stats, TIME_COLS, fast_grid=fast_grid)
+
+        table = min(timeit.repeat(lambda: build(False), number=1, repeat=3))
+        grid = min(timeit.repeat(lambda: build(True), number=1, repeat=3))
+        print(f"{pages:>6} {table:>8.2f} {grid:>8.2f} {table / grid:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Peak memory and build time of pdf_generator.generate_pdf for long plans.
+
+Compares the current FooterCanvas with the previous one that kept a copy of
+every page's canvas state until save(). Synthetic plans of 100 to 400 pages
+(12 schedule rows per page) are rendered and measured with tracemalloc.
+
+Then checks that the chunked build (pdf_parallel.generate_pdf, without worker
+processes) keeps peak memory flat: each plan of 100 to 800 pages is rendered
+in a fresh interpreter, and the script fails if the peak RSS the render adds
+grows by more than RSS_SLACK_MB between the shortest and the longest plan.
+
+Run from the repository root:
+    python benchmarks/bench_pdf_memory.py
+"""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_generator
+import pdf_parallel
+
+SUBJECTS = ["Anatomy", "Physiology", "Biochemistry", "Pathology", "Pharmacology",
+            "Microbiology", "Forensic Medicine", "Community Medicine", "Medicine",
+            "Surgery", "Obstetrics & Gynaecology", "Paediatrics"]
+TIME_COLS = ["06:00-08:00", "08:00-10:00", "10:00-12:00", "14:00-16:00", "16:00-18:00", "18:00-20:00"]
+
+# Allowed growth of the chunked build's peak RSS from 100 to 800 pages; the
+# single-document build adds about 20 MB over the same range
+RSS_SLACK_MB = 6
+
+
+class StoredPagesCanvas(canvas.Canvas):
+    """The previous FooterCanvas: every page's state is kept until save()"""
+
+    def __init__(self, *args, **kwargs):
+        canvas.Canvas.__init__(self, *args, **kwargs)
+        self.pages = []
+
+    def showPage(self):
+        self.pages.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        page_count = len(self.pages)
+        for page_num, page in enumerate(self.pages, 1):
+            self.__dict__.update(page)
+            self.draw_page_footer(page_num)
+            self.draw_page_number(page_num, page_count)
+            canvas.Canvas.showPage(self)
+        canvas.Canvas.save(self)
+
+    draw_page_footer = pdf_generator.FooterCanvas.draw_page_footer
+    draw_page_number = pdf_generator.FooterCanvas.draw_page_number
+
+
+def synthetic_plan(n_days, start=date(2026, 1, 1)):
+    days, summary = [], {}
+    for i in range(n_days):
+        d = start + timedelta(days=i)
+        day = {"date_display": f"{d.isoformat()} ({d.strftime('%A')})",
+               "is_special": False, "special_label": "", "slots_map": {}}
+        if i % 7 == 6:
+            day["is_special"] = True
+            day["special_label"] = "Grand Test" if i % 14 == 13 else "Weekly Revision"
+        for j, slot in enumerate(TIME_COLS):
+            subject = SUBJECTS[(i // 20 + j // 3) % len(SUBJECTS)]
+            day["slots_map"][slot] = subject
+            summary[subject] = summary.get(subject, 0) + 1
+        days.append(day)
+    return {"days": days, "summary": summary}
+
+
+def plan(pages):
+    main_days = pages * 12
+    main_data = synthetic_plan(main_days)
+    rev_data = synthetic_plan(60, start=date(2026, 1, 1) + timedelta(days=main_days))
+    stats = {"total_days": main_days + 60, "main_days": main_days, "rev_days": 60}
+    return main_data, rev_data, stats
+
+
+def build(main_data, rev_data, stats):
+    random.seed(0)
+    return pdf_generator.generate_pdf(main_data, rev_data, stats, TIME_COLS)
+
+
+def measure(canvas_class, main_data, rev_data, stats):
+    pdf_generator.FooterCanvas, original = canvas_class, pdf_generator.FooterCanvas
+    try:
+        # Timed without tracing, which slows allocation-heavy layout several-fold
+        started = time.perf_counter()
+        buffer = build(main_data, rev_data, stats)
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        build(main_data, rev_data, stats)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        pdf_generator.FooterCanvas = original
+    return peak, elapsed, len(buffer.getvalue())
+
+
+def peak_rss(reset=False):
+    """This process's peak RSS in KB (Linux). reset first lowers the peak to the current RSS."""
+    # ru_maxrss would include the parent's peak, which a child inherits
+    if reset:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+
+def chunked_rss(pages):
+    """Runs in a fresh interpreter: print the peak RSS (KB) a chunked build of pages adds."""
+    main_data, rev_data, stats = plan(pages)
+    before = peak_rss(reset=True)
+    with tempfile.TemporaryFile() as f:
+        pdf_parallel.generate_pdf(main_data, rev_data, stats, TIME_COLS, output=f, parallel=False)
+    print(peak_rss() - before)
+
+
+def check_chunked_rss():
+    print(f"\n{'pages':>6} {'chunked build RSS MB':>21}")
+    growth = {}
+    for pages in (100, 200, 400, 800):
+        result = subprocess.run([sys.executable, __file__, "--chunked-rss", str(pages)],
+                                capture_output=True, text=True, check=True)
+        growth[pages] = int(result.stdout) / 1024
+        print(f"{pages:>6} {growth[pages]:>21.1f}")
+    if growth[800] - growth[100] > RSS_SLACK_MB:
+        sys.exit(f"chunked build peak RSS grew by {growth[800] - growth[100]:.1f} MB "
+                 f"from 100 to 800 pages (allowed {RSS_SLACK_MB} MB)")
+
+
+def main():
+    print(f"{'pages':>6} {'canvas':<14} {'peak MB':>8} {'build s':>8} {'PDF KB':>8}")
+    for pages in (100, 200, 400):
+        main_data, rev_data, stats = plan(pages)
+        for name, canvas_class in (("stored pages", StoredPagesCanvas),
+                                   ("FooterCanvas", pdf_generator.FooterCanvas)):
+            peak, elapsed, size = measure(canvas_class, main_data, rev_data, stats)
+            print(f"{pages:>6} {name:<14} {peak / 2**20:>8.1f} {elapsed:>8.2f} {size / 1024:>8.0f}")
+    check_chunked_rss()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--chunked-rss"]:
+        chunked_rss(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,49 @@
+"""
+Wall-clock time of the sequential PDF build against pdf_parallel's section
+rendering, which lays out chunks in PDF_RENDER_WORKERS processes and merges
+them with pypdf. Also checks that both builds produce the same page count.
+
+Run from the repository root (the speedup needs more than one core):
+    PDF_RENDER_WORKERS=4 python benchmarks/bench_pdf_parallel.py
+"""
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader
+
+import pdf_generator
+import pdf_parallel
+from bench_pdf_memory import TIME_COLS, synthetic_plan
+
+
+def timed(build):
+    started = time.perf_counter()
+    buffer = build()
+    return time.perf_counter() - started, len(PdfReader(buffer).pages)
+
+
+def main():
+    print(f"workers: {pdf_parallel.WORKERS}, chunk: {pdf_parallel.CHUNK_PAGES} pages")
+    print(f"{'pages':>6} {'sequential s':>13} {'parallel s':>11} {'speedup':>8}")
+    # Start the pool before timing
+    warmup_stats = {"total_days": 24, "main_days": 12, "rev_days": 12}
+    pdf_parallel.generate_pdf(synthetic_plan(12), synthetic_plan(12), warmup_stats, TIME_COLS, parallel=True)
+    for pages in (100, 200, 400):
+        main_days = pages * 12
+        main_data = synthetic_plan(main_days)
+        rev_data = synthetic_plan(60, start=date(2026, 1, 1) + timedelta(days=main_days))
+        stats = {"total_days": main_days + 60, "main_days": main_days, "rev_days": 60}
+
+        sequential, seq_pages = timed(lambda: pdf_generator.generate_pdf(main_data, rev_data, stats, TIME_COLS))
+        parallel, par_pages = timed(lambda: pdf_parallel.generate_pdf(main_data, rev_data, stats, TIME_COLS, parallel=True))
+        assert seq_pages == par_pages, (seq_pages, par_pages)
+        print(f"{pages:>6} {sequential:>13.2f} {parallel:>11.2f} {sequential / parallel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
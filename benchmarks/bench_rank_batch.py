@@ -0,0 +1,48 @@
+"""
+Throughput of batch rank prediction: one vectorized call versus a Python
+loop of single predictions, and end to end through /api/predict-rank/batch.
+
+Run from the repository root:
+    python benchmarks/bench_rank_batch.py
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rank_predictor
+
+
+def throughput(fn, n):
+    started = time.perf_counter()
+    fn()
+    return n / (time.perf_counter() - started)
+
+
+def main():
+    from app import app
+    client = app.test_client()
+    rng = np.random.default_rng(0)
+
+    print(f"{'engine':<11} {'batch':>7} {'loop/s':>12} {'vectorized/s':>14} {'endpoint/s':>12}")
+    for engine in rank_predictor.ENGINES:
+        table = rank_predictor.get_rank_table(engine=engine)
+        for n in (1_000, 10_000, 50_000):
+            scores = rng.integers(0, 801, n).astype(float)
+            scores[::10] += 0.5  # keep some fractional scores in the mix
+            scores = np.minimum(scores, 800)
+            # The endpoint accepts whole scores only
+            payload = {"scores": np.floor(scores).astype(int).tolist(), "engine": engine}
+
+            loop = throughput(lambda: [table.predict_score(s) for s in scores], n)
+            vectorized = throughput(lambda: table.predict_scores(scores), n)
+            endpoint = throughput(lambda: client.post("/api/predict-rank/batch", json=payload), n)
+            print(f"{engine:<11} {n:>7} {loop:>12,.0f} {vectorized:>14,.0f} {endpoint:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
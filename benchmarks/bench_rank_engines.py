@@ -0,0 +1,80 @@
+"""
+Benchmark and accuracy report for the rank predictor engines.
+
+Compares the polynomial regression with the empirical monotone engine on a
+held-out 20% of the ranks table, checks monotonicity over every score from
+0 to 800 and times single predictions.
+
+Run from the repository root:
+    python benchmarks/bench_rank_engines.py
+"""
+
+import os
+import sqlite3
+import sys
+import timeit
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rank_predictor
+from rank_predictor import DB_FILE, MAX_SCORE, EmpiricalRankTable, RankTable, fit_empirical
+
+
+def split_rows(seed=42, test_fraction=0.2):
+    conn = sqlite3.connect(DB_FILE)
+    rows = np.array(conn.execute("SELECT Score, Rank FROM ranks").fetchall(), dtype=float)
+    conn.close()
+    rng = np.random.default_rng(seed)
+    mask = rng.random(len(rows)) < test_fraction
+    return rows[~mask], rows[mask]
+
+
+def fit_polynomial(train, degree=3):
+    model = make_pipeline(PolynomialFeatures(degree), LinearRegression())
+    model.fit(train[:, :1] / MAX_SCORE * 100, train[:, 1])
+    regression = model[-1]
+    coefficients = [float(regression.intercept_)] + [float(c) for c in regression.coef_[1:]]
+    table = RankTable(coefficients, [])
+    table.ranks = [table.predict_rank(s / MAX_SCORE * 100) for s in range(MAX_SCORE + 1)]
+    return table
+
+
+def report(name, table, test):
+    predicted = np.array([table.predict_score(s) for s in test[:, 0]], dtype=float)
+    errors = np.abs(predicted - test[:, 1])
+    grid = [table.predict_score(s) for s in range(MAX_SCORE + 1)]
+    violations = sum(1 for a, b in zip(grid, grid[1:]) if b > a)
+
+    bands = [table.predict_band(s) for s in test[:, 0]]
+    covered = np.mean([b["p10"] <= r <= b["p90"] for b, r in zip(bands, test[:, 1])])
+
+    n = 100_000
+    scores = list(range(MAX_SCORE + 1))
+    seconds = timeit.timeit(lambda: [table.predict_score(s) for s in scores], number=n // len(scores))
+    per_call_us = seconds / ((n // len(scores)) * len(scores)) * 1e6
+
+    print(f"{name:<11} MAE {errors.mean():>9.1f}  median AE {np.median(errors):>8.1f}  "
+          f"MAPE {np.mean(errors / test[:, 1]) * 100:>6.1f}%  "
+          f"p10-p90 coverage {covered * 100:>5.1f}%  "
+          f"non-monotone steps {violations:>3}  {per_call_us:.2f} us/prediction")
+
+
+def main():
+    train, test = split_rows()
+    print(f"{len(train)} training rows, {len(test)} held-out rows\n")
+
+    report("polynomial", fit_polynomial(train), test)
+    report("empirical", EmpiricalRankTable(fit_empirical(train[:, 0], train[:, 1])), test)
+
+    print("\nServing artifacts (in-sample):")
+    for engine in rank_predictor.ENGINES:
+        report(engine, rank_predictor.get_rank_table(engine=engine), test)
+
+
+if __name__ == "__main__":
+    main()
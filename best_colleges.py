@@ -1,13 +1,22 @@
+import base64
+import json
+import logging
+import re
 import sqlite3
-import pandas as pd
+
+import lookup_cache
 
 DB_PATH = "database/medical_allotment.db"
 
+logger = logging.getLogger(__name__)
+
 def get_connection():
     return sqlite3.connect(DB_PATH)
 
-def get_states():
-    conn = get_connection()
+def _load_states(conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
     cur = conn.cursor()
     cur.execute("""
         SELECT DISTINCT state
@@ -16,10 +25,14 @@ def get_states():
         ORDER BY state
     """)
     states = [row[0] for row in cur.fetchall()]
-    conn.close()
+    if own_conn:
+        conn.close()
     return states
 
-def get_courses():
+def get_states(conn=None):
+    return lookup_cache.cached(DB_PATH, 'best_colleges.states', lambda: _load_states(conn))
+
+def _load_courses():
     conn = get_connection()
     cur = conn.cursor()
     cur.execute("""
@@ -31,95 +44,508 @@ def get_courses():
     conn.close()
     return courses
 
-def get_best_colleges_by_course(course, state_filter=None, top_n=1000):
-    """
-    Gets the best colleges filtered by course and optionally state,
-    ranked by average rank stored in college_ranker.
+def get_courses():
+    return lookup_cache.cached(DB_PATH, 'best_colleges.courses', _load_courses)
+
+COLUMNS = ['S.No', 'College Name', 'State', 'Course', 'Address', 'Average Rank', 'Total Seats', 'College Score']
+
+def _ranking_query(n_courses, state_filter):
     """
-    conn = get_connection()
+    One statement that ranks colleges for n_courses courses (None: every course).
 
-    query = """
+    Per course: keep the top_n lowest average ranks, attach seat counts,
+    min-max normalise rank and seats with window MIN/MAX, combine them as
+    0.7 * rank + 0.3 * seats and number the result by score. Ties keep
+    average-rank order. Parameters: courses, [state], [state], top_n.
+    """
+    if n_courses is None:
+        # college_scores is keyed by course: rows without one cannot be stored
+        course_clause = "course IS NOT NULL"
+    else:
+        course_clause = "course IN ({})".format(",".join("?" for _ in range(n_courses)))
+    state_clause = " AND state = ?" if state_filter else ""
+    seat_state_clause = " AND a.state = ?" if state_filter else ""
+    return f"""
+    WITH ranked AS (
+        SELECT
+            college_name,
+            course,
+            address,
+            state,
+            avg_rank,
+            ROW_NUMBER() OVER (PARTITION BY course ORDER BY avg_rank ASC) AS pos
+        FROM college_ranker
+        WHERE {course_clause}
+          AND avg_rank IS NOT NULL{state_clause}
+    ),
+    joined AS (
+        -- Seat count per college, answered from the (course, college_name, state) index
+        SELECT
+            r.*,
+            (SELECT COUNT(*)
+             FROM allotted_seats a
+             WHERE a.course = r.course
+               AND a.college_name = r.college_name{seat_state_clause}) AS total_seats
+        FROM ranked r
+        WHERE r.pos <= ?
+    ),
+    bounds AS (
+        SELECT
+            *,
+            MIN(avg_rank) OVER w AS min_rank,
+            MAX(avg_rank) OVER w AS max_rank,
+            MIN(total_seats) OVER w AS min_seats,
+            MAX(total_seats) OVER w AS max_seats
+        FROM joined
+        WINDOW w AS (PARTITION BY course)
+    ),
+    scored AS (
+        SELECT
+            *,
+            CASE WHEN max_rank = min_rank THEN 1.0
+                 ELSE CAST(max_rank - avg_rank AS REAL) / (max_rank - min_rank) END * 0.7
+          + CASE WHEN max_seats = min_seats THEN 1.0
+                 ELSE CAST(total_seats - min_seats AS REAL) / (max_seats - min_seats) END * 0.3
+            AS college_score
+        FROM bounds
+    )
     SELECT
+        ROW_NUMBER() OVER (PARTITION BY course ORDER BY college_score DESC, pos ASC) AS sno,
         college_name,
+        state,
         course,
         address,
-        state,
-        avg_rank
-    FROM college_ranker
-    WHERE course = ?
-      AND avg_rank IS NOT NULL
+        avg_rank,
+        total_seats,
+        college_score
+    FROM scored
+    ORDER BY course, sno
     """
-    params = [course]
 
-    if state_filter:
-        query += " AND state = ?"
-        params.append(state_filter)
+def _ranking_params(courses, state_filter, top_n):
+    state = [state_filter] if state_filter else []
+    return list(courses or []) + state + state + [top_n]
 
-    # Display full list by default, limit by very high number top_n (default 1000)
-    query += " ORDER BY avg_rank ASC LIMIT ?"
-    params.append(top_n)
+def _display_row(row):
+    # Same rounding as before: half-to-even rank, score to 3 places
+    sno, name, state, course, address, avg_rank, seats, score = row
+    return (sno, name, state, course, address, int(round(avg_rank)), seats, round(score * 1000) / 1000)
 
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
+#   ------   materialized college_scores   ------
+# college_scores holds the ranking above for every course, once for all
+# states ('ALL') and once per state, at the default top_n. Triggers created
+# by db_init.init_college_scores_db() bump source_version whenever
+# college_ranker or allotted_seats change; the table is rebuilt when the
+# version it was built from (derived_meta) falls behind.
+
+MATERIALIZED_TOP_N = 1000
+ALL_STATES = 'ALL'
 
-    if df.empty:
-        return df
+def _state_key(state_filter):
+    """college_scores.state_key for state_filter: ALL_STATES when there is no filter."""
+    if not state_filter:
+        return ALL_STATES
+    # No state is called ALL_STATES; None matches no rows, as the live ranking would
+    return None if state_filter == ALL_STATES else state_filter
 
+def _derived_state(conn, name):
+    """(source version, built version) for a derived table, or None if the tables are missing."""
+    try:
+        return conn.execute("""
+            SELECT
+                (SELECT version FROM source_version WHERE name = 'college_data'),
+                (SELECT built_version FROM derived_meta WHERE name = ?)
+        """, (name,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+
+def _refresh_derived(conn, name, build, force=False):
+    """
+    Run build(conn) to rebuild a derived table if the source tables changed
+    since its last build. Returns True if a rebuild happened. A failed
+    rebuild is logged and rolled back, leaving the previous build (still
+    marked stale) in place; it is retried on the next refresh.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        state = _derived_state(conn, name)
+        if state is None or (state[0] == state[1] and not force):
+            return False
+
+        # Take the write lock first so concurrent workers rebuild only once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version, built = _derived_state(conn, name)
+            if version == built and not force:
+                conn.rollback()
+                return False
+
+            build(conn)
+            conn.execute("INSERT OR REPLACE INTO derived_meta (name, built_version) VALUES (?, ?)",
+                         (name, version))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return True
+    except sqlite3.Error:
+        logger.exception("Rebuilding %s failed", name)
+        return False
+    finally:
+        if own_conn:
+            conn.close()
+
+def _build_college_scores(conn):
+    conn.execute("DELETE FROM college_scores")
+    insert = """
+    INSERT INTO college_scores
+        (state_key, sno, college_name, state, course, address, avg_rank, total_seats, college_score)
+    SELECT ?, ranking.* FROM ({}) ranking
+    """
+    conn.execute(insert.format(_ranking_query(None, None)),
+                 [ALL_STATES] + _ranking_params(None, None, MATERIALIZED_TOP_N))
+    for st in get_states(conn):
+        conn.execute(insert.format(_ranking_query(None, st)),
+                     [st] + _ranking_params(None, st, MATERIALIZED_TOP_N))
+
+def refresh_college_scores(conn=None, force=False):
+    """
+    Rebuild college_scores if the source tables changed since the last build.
+    Returns True if a rebuild happened.
+    """
+    return _refresh_derived(conn, 'college_scores', _build_college_scores, force)
+
+def _college_scores_fresh(conn):
+    """True if college_scores exists and is up to date, rebuilding it first if it is stale."""
+    state = _derived_state(conn, 'college_scores')
+    if state is None:
+        return False
+    if state[0] != state[1]:
+        refresh_college_scores(conn)
+        state = _derived_state(conn, 'college_scores')
+    # A failed rebuild leaves it stale: callers rank from the source tables instead
+    return state[0] == state[1]
+
+def _read_college_scores(conn, courses, state_filter):
+    """Indexed range read from college_scores, or None if it is unavailable or stale."""
+    if not _college_scores_fresh(conn):
+        return None
+
+    placeholders = ",".join("?" for _ in courses)
+    cur = conn.execute(f"""
+        SELECT sno, college_name, state, course, address, avg_rank, total_seats, college_score
+        FROM college_scores
+        WHERE state_key = ? AND course IN ({placeholders})
+        ORDER BY course, sno
+    """, [_state_key(state_filter)] + list(courses))
+    return cur
+
+
+def get_best_colleges_by_course(course, state_filter=None, top_n=1000, conn=None):
+    """
+    Gets the best colleges filtered by course and optionally state,
+    ranked by average rank stored in college_ranker.
+    Returns row tuples in COLUMNS order.
+    Pass conn to reuse an open connection; it is left open for the caller.
+    """
+    return get_best_colleges_by_courses([course], state_filter=state_filter, top_n=top_n, conn=conn)[course]
+
+def get_best_colleges_by_courses(courses, state_filter=None, top_n=1000, conn=None):
+    """
+    Batched get_best_colleges_by_course: one statement for all courses.
+    Returns {course: [row tuples]}, each ranked exactly as the single-course call.
+    The default top_n is served from the materialized college_scores table.
+    """
+    if not courses:
+        return {}
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+
+    cur = None
+    if top_n == MATERIALIZED_TOP_N:
+        cur = _read_college_scores(conn, courses, state_filter)
+    if cur is None:
+        cur = conn.execute(_ranking_query(len(courses), state_filter),
+                           _ranking_params(courses, state_filter, top_n))
+
+    results = {course: [] for course in courses}
+    for row in cur:
+        results[row[3]].append(_display_row(row))
+
+    if own_conn:
+        conn.close()
+    return results
+
+
+def compare_colleges(courses, state_filter=None, conn=None):
+    """
+    College x course matrix for side-by-side comparison.
+    Every course is ranked in the same single statement as
+    get_best_colleges_by_courses; each cell holds that course's position and
+    score for the college, or None where the college does not offer it.
+    Colleges offering more of the compared courses come first, then by total score.
+    """
+    courses = list(dict.fromkeys(courses))
+    rankings = get_best_colleges_by_courses(courses, state_filter=state_filter, conn=conn)
+
+    colleges = {}
+    for i, course in enumerate(courses):
+        for sno, college_name, state, _, address, avg_rank, total_seats, college_score in rankings[course]:
+            entry = colleges.get((college_name, state))
+            if entry is None:
+                entry = colleges[(college_name, state)] = {
+                    "college_name": college_name,
+                    "state": state,
+                    "address": address,
+                    "cells": [None] * len(courses),
+                }
+            entry["cells"][i] = {"rank": sno, "score": college_score,
+                                 "avg_rank": avg_rank, "total_seats": total_seats}
+
+    def order(entry):
+        present = [cell for cell in entry["cells"] if cell]
+        return (-len(present), -sum(cell["score"] for cell in present), entry["college_name"])
+
+    return {"courses": courses, "state": state_filter, "colleges": sorted(colleges.values(), key=order)}
+
+
+#   ------   paginated and streamed reads   ------
+
+def encode_cursor(college_score, sno):
+    raw = json.dumps([college_score, sno]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for anything malformed."""
+    try:
+        college_score, sno = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(college_score, (int, float)) or not isinstance(sno, int) or isinstance(sno, bool):
+        raise ValueError("Invalid cursor")
+    return college_score, sno
+
+def _page_key(row):
+    # Keyset order: college_score descending, then S.No (unique per course and state key)
+    return (-row[7], row[0])
+
+def get_best_colleges_page(course, state_filter=None, limit=50, cursor=None, conn=None):
+    """
+    One page of the default best-colleges ranking, keyset-paginated on
+    (college_score DESC, sno ASC), i.e. S.No order. Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        after = decode_cursor(cursor) if cursor else None
+        if _college_scores_fresh(conn):
+            query = """
+                SELECT sno, college_name, state, course, address, avg_rank, total_seats, college_score
+                FROM college_scores
+                WHERE course = ? AND state_key = ?
+            """
+            params = [course, _state_key(state_filter)]
+            if after:
+                query += " AND (college_score < ? OR (college_score = ? AND sno > ?))"
+                params += [after[0], after[0], after[1]]
+            query += " ORDER BY college_score DESC, sno ASC LIMIT ?"
+            params.append(limit + 1)
+            rows = conn.execute(query, params).fetchall()
+        else:
+            rows = conn.execute(_ranking_query(1, state_filter),
+                                _ranking_params([course], state_filter, MATERIALIZED_TOP_N)).fetchall()
+            rows.sort(key=_page_key)
+            if after:
+                rows = [r for r in rows if _page_key(r) > (-after[0], after[1])]
+            rows = rows[:limit + 1]
+    finally:
+        if own_conn:
+            conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][7], rows[-1][0])
+    return [_display_row(r) for r in rows], next_cursor
+
+def count_best_colleges(course, state_filter=None, conn=None):
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        if _college_scores_fresh(conn):
+            return conn.execute("SELECT COUNT(*) FROM college_scores WHERE course = ? AND state_key = ?",
+                                (course, _state_key(state_filter))).fetchone()[0]
+        return len(get_best_colleges_by_course(course, state_filter, conn=conn))
+    finally:
+        if own_conn:
+            conn.close()
+
+def iter_best_colleges(course, state_filter=None, top_n=MATERIALIZED_TOP_N):
+    """Yield ranked rows as they are read, for streamed rendering."""
     conn = get_connection()
+    try:
+        cur = None
+        if top_n == MATERIALIZED_TOP_N:
+            cur = _read_college_scores(conn, [course], state_filter)
+        if cur is None:
+            cur = conn.execute(_ranking_query(1, state_filter), _ranking_params([course], state_filter, top_n))
+        for row in cur:
+            yield _display_row(row)
+    finally:
+        conn.close()
 
-    seats_query = """
-    SELECT
-        college_name,
-        course,
-        COUNT(*) AS total_seats
-    FROM allotted_seats
-    WHERE course = ?
+
+#   ------   state rollups   ------
+
+ALL_QUOTAS = 'ALL'
+STATE_OVERVIEW_ORDER = {
+    'seats': 'total_seats DESC, state',
+    'colleges': 'college_count DESC, state',
+    'avg_rank': 'avg_closing_rank ASC, state',
+    'min_rank': 'min_closing_rank ASC, state',
+}
+
+def _build_state_rollups(conn):
+    conn.execute("DELETE FROM state_rollups")
+    # A college's closing rank is the last rank it admitted for the course (and quota)
+    insert = """
+    INSERT INTO state_rollups
+        (course, quota_key, state, total_seats, college_count, avg_closing_rank, min_closing_rank)
+    SELECT course, quota_key, state, SUM(seats), COUNT(*), AVG(closing_rank), MIN(closing_rank)
+    FROM (
+        SELECT course, {quota} AS quota_key, state, college_name,
+               COUNT(*) AS seats, MAX(rank) AS closing_rank
+        FROM allotted_seats
+        -- Rows missing a key column cannot be stored in state_rollups
+        WHERE state IS NOT NULL AND course IS NOT NULL AND {quota} IS NOT NULL
+        GROUP BY course, quota_key, state, college_name
+    )
+    GROUP BY course, quota_key, state
+    """
+    conn.execute(insert.format(quota="allotted_quota"))
+    conn.execute(insert.format(quota="?"), (ALL_QUOTAS, ALL_QUOTAS))
+
+def refresh_state_rollups(conn=None, force=False):
+    """
+    Rebuild state_rollups (seats, colleges and closing ranks per
+    course x quota x state) if the source tables changed since the last build.
+    Returns True if a rebuild happened.
     """
-    seats_params = [course]
+    return _refresh_derived(conn, 'state_rollups', _build_state_rollups, force)
 
-    if state_filter:
-        seats_query += " AND state = ?"
-        seats_params.append(state_filter)
+def get_state_overview(course, quota=None, order_by='seats', conn=None):
+    """
+    Per-state seats, college count and average/best closing rank for a course,
+    optionally within one quota. One primary-key range read on state_rollups.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        state = _derived_state(conn, 'state_rollups')
+        if state is None:
+            raise RuntimeError("state_rollups is not initialized; run db_init.py")
+        if state[0] != state[1]:
+            refresh_state_rollups(conn)
 
-    seats_query += " GROUP BY college_name, course"
+        rows = conn.execute(f"""
+            SELECT state, total_seats, college_count, avg_closing_rank, min_closing_rank
+            FROM state_rollups
+            WHERE course = ? AND quota_key = ?
+            ORDER BY {STATE_OVERVIEW_ORDER[order_by]}
+        """, (course, quota or ALL_QUOTAS)).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
 
-    seats_df = pd.read_sql_query(seats_query, conn, params=seats_params)
-    conn.close()
+    return [{
+        "state": st,
+        "total_seats": seats,
+        "college_count": colleges,
+        "avg_closing_rank": int(round(avg_rank)) if avg_rank is not None else None,
+        "min_closing_rank": min_rank,
+    } for st, seats, colleges, avg_rank, min_rank in rows]
 
-    df = df.merge(seats_df, how='left', on=['college_name', 'course'])
-    df['total_seats'] = df['total_seats'].fillna(0).astype(int)
 
-    max_rank = df['avg_rank'].max()
-    min_rank = df['avg_rank'].min()
-    def norm_rank(r):
-        return 1.0 if max_rank == min_rank else (max_rank - r) / (max_rank - min_rank)
-    df['norm_avg_rank'] = df['avg_rank'].apply(norm_rank)
+#   ------   typeahead search   ------
 
-    max_seats = df['total_seats'].max()
-    min_seats = df['total_seats'].min()
-    def norm_seats(s):
-        return 1.0 if max_seats == min_seats else (s - min_seats) / (max_seats - min_seats)
-    df['norm_seats'] = df['total_seats'].apply(norm_seats)
+SEARCH_KINDS = ('college', 'course')
+# Course sources: allotted_seats (course predictor) and college_ranker (best colleges)
+SEARCH_SOURCES = ('allotments', 'rankings')
 
-    df['college_score'] = df['norm_avg_rank'] * 0.7 + df['norm_seats'] * 0.3
+def _build_search_index(conn):
+    conn.execute("DELETE FROM search_index")
+    conn.execute("""
+        INSERT INTO search_index (kind, label, state, address)
+        SELECT 'college', college_name, state, MIN(address)
+        FROM college_ranker
+        WHERE college_name IS NOT NULL
+        GROUP BY college_name, state
+    """)
+    conn.execute("""
+        INSERT INTO search_index (kind, label, state, address, source)
+        SELECT 'course', course, NULL, NULL, GROUP_CONCAT(source, ' ')
+        FROM (SELECT DISTINCT course, 'allotments' AS source FROM allotted_seats
+              UNION SELECT DISTINCT course, 'rankings' FROM college_ranker)
+        WHERE course IS NOT NULL
+        GROUP BY course
+    """)
 
-    df = df.sort_values('college_score', ascending=False).head(top_n).reset_index(drop=True)
+def refresh_search_index(conn=None, force=False):
+    """
+    Rebuild the FTS5 search_index if the source tables changed since the last build.
+    Returns True if a rebuild happened.
+    """
+    return _refresh_derived(conn, 'search_index', _build_search_index, force)
 
-    df['avg_rank'] = df['avg_rank'].round(0).astype(int)
-    df['college_score'] = df['college_score'].round(3)
+def _match_expression(query):
+    # Every word must match as a prefix: "aiims del" -> "aiims"* "del"*
+    tokens = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{t}"*' for t in tokens)
 
-    # Add serial number starting from 1
-    df.insert(0, 'S.No', range(1, len(df) + 1))
+def search(query, kind=None, limit=10, source=None, conn=None):
+    """
+    Prefix search over college names, addresses, states and course names.
+    Returns up to limit dicts of kind, label, state and address, best match first.
+    With an empty query and a kind, lists that kind alphabetically (lazy dropdowns).
+    source (one of SEARCH_SOURCES) keeps only courses found in that table.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        state = _derived_state(conn, 'search_index')
+        if state is not None and state[0] != state[1]:
+            refresh_search_index(conn)
 
-    # Rename columns nicely for display
-    df = df.rename(columns={
-        'college_name': 'College Name',
-        'state': 'State',
-        'course': 'Course',
-        'address': 'Address',
-        'avg_rank': 'Average Rank',
-        'total_seats': 'Total Seats',
-        'college_score': 'College Score'
-    })
+        match = _match_expression(query or "")
+        kind_filter = " AND kind = ?" if kind else ""
+        kind_params = [kind] if kind else []
+        if source:
+            kind_filter += " AND (' ' || source || ' ') LIKE ?"
+            kind_params.append(f"% {source} %")
+        if match:
+            sql = f"""
+                SELECT kind, label, state, address FROM search_index
+                WHERE search_index MATCH ?{kind_filter}
+                ORDER BY rank LIMIT ?
+            """
+            params = [match] + kind_params + [limit]
+        elif kind:
+            sql = f"SELECT kind, label, state, address FROM search_index WHERE 1 = 1{kind_filter} ORDER BY label LIMIT ?"
+            params = kind_params + [limit]
+        else:
+            return []
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
 
-    return df[['S.No', 'College Name', 'State', 'Course', 'Address', 'Average Rank', 'Total Seats', 'College Score']]
+    return [{"kind": k, "label": label, "state": st, "address": address}
+            for k, label, st, address in rows]
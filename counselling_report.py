@@ -0,0 +1,55 @@
+import time
+
+import best_colleges
+import course_predictor
+from rank_predictor import predict_rank_for_score
+
+def build_report(score, quota, category, state=None, max_courses=20, colleges_per_course=5, engine=None):
+    """
+    Score -> predicted rank -> eligible courses -> top colleges per course,
+    all inside one request on a single database connection.
+
+    Courses are listed most competitive first (lowest closing rank) and the
+    college list for each matches the /best-colleges ranking for that course
+    and state, truncated to colleges_per_course. All courses are ranked in
+    one batched pass rather than one query pair per course.
+    """
+    started = time.perf_counter()
+    predicted_rank = predict_rank_for_score(score, engine=engine)
+
+    conn = course_predictor.get_connection()
+    try:
+        eligible = course_predictor.get_eligible_courses(predicted_rank, quota, category, conn=conn)
+
+        # A PwD category also matches its base category; keep the first (tighter) row
+        unique = {}
+        for row in eligible:
+            unique.setdefault(row[0], row)
+
+        selected = list(unique.values())[:max_courses]
+        rankings = best_colleges.get_best_colleges_by_courses(
+            [row[0] for row in selected], state_filter=state, conn=conn)
+
+        courses = []
+        for course, allotted_quota, allotted_category, last_rank in selected:
+            courses.append({
+                "course": course,
+                "quota": allotted_quota,
+                "category": allotted_category,
+                "last_rank": int(last_rank),
+                "colleges": [dict(zip(best_colleges.COLUMNS, row))
+                             for row in rankings[course][:colleges_per_course]],
+            })
+    finally:
+        conn.close()
+
+    return {
+        "score": score,
+        "predicted_rank": predicted_rank,
+        "quota": quota,
+        "category": category,
+        "state": state,
+        "eligible_course_count": len(unique),
+        "courses": courses,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -1,5 +1,7 @@
 import sqlite3
 
+import lookup_cache
+
 DB_PATH = "database/medical_allotment.db"
 
 
@@ -27,7 +29,7 @@ def get_non_pwd_category(category):
     return pwd_map.get(cat_clean, cat_clean)
 
 
-def get_courses():
+def _load_courses():
     conn = get_connection()
     cur = conn.cursor()
     cur.execute("SELECT DISTINCT course FROM allotted_seats ORDER BY course")
@@ -36,7 +38,11 @@ def get_courses():
     return courses
 
 
-def get_categories():
+def get_courses():
+    return lookup_cache.cached(DB_PATH, "course_predictor.courses", _load_courses)
+
+
+def _load_categories():
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
@@ -47,21 +53,31 @@ def get_categories():
     return categories
 
 
-def get_quotas(course):
+def get_categories():
+    return lookup_cache.cached(DB_PATH, "course_predictor.categories", _load_categories)
+
+
+def _load_quota_map():
+    # Every course's quotas in one pass, so /get_quotas never queries
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
-        SELECT DISTINCT allotted_quota
+        SELECT DISTINCT course, allotted_quota
         FROM allotted_seats
-        WHERE course = ?
-        ORDER BY allotted_quota
-    """,
-        (course,),
+        ORDER BY course, allotted_quota
+    """
     )
-    quotas = [row[0] for row in cur.fetchall()]
+    quota_map = {}
+    for course, quota in cur.fetchall():
+        quota_map.setdefault(course, []).append(quota)
     conn.close()
-    return quotas
+    return quota_map
+
+
+def get_quotas(course):
+    quota_map = lookup_cache.cached(DB_PATH, "course_predictor.quotas", _load_quota_map)
+    return quota_map.get(course, [])
 
 
 def get_last_rank(selected_course, selected_quota, selected_category):
@@ -103,9 +119,12 @@ def get_last_rank(selected_course, selected_quota, selected_category):
     return None
 
 
-def get_eligible_courses(my_rank, selected_quota, selected_category):
+def get_eligible_courses(my_rank, selected_quota, selected_category, conn=None):
     selected_category = clean_category(selected_category)
-    conn = get_connection()
+    # Callers chaining several lookups can pass their own connection
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
     cur = conn.cursor()
 
     categories_to_check = [selected_category]
@@ -127,5 +146,6 @@ def get_eligible_courses(my_rank, selected_quota, selected_category):
     params = categories_to_check + [selected_quota, my_rank]
     cur.execute(query, params)
     eligible_courses = cur.fetchall()
-    conn.close()
+    if own_conn:
+        conn.close()
     return eligible_courses
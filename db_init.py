@@ -140,8 +140,159 @@ def init_revision_timetable_db():
         conn.close()
         print(f"Initialized {database}")
 
+def init_medical_allotment_indexes():
+    """Indexes for the course predictor, best colleges and counselling report lookups.
+
+    medical_allotment.db is shipped as data, so only touch it when it exists.
+    """
+    database = "database/medical_allotment.db"
+    if not os.path.exists(database):
+        print(f"Skipped {database} (not found)")
+        return
+    conn = create_connection(database)
+    if conn is not None:
+        cursor = conn.cursor()
+        # Eligibility: WHERE allotted_quota = ? AND allotted_category IN (...) GROUP BY course
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_seats_quota_category
+            ON allotted_seats (allotted_quota, allotted_category, course, rank);
+        ''')
+        # Seat counts per college: WHERE course = ? AND college_name = ? [AND state = ?]
+        cursor.execute("DROP INDEX IF EXISTS idx_seats_course_state")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_seats_course_college
+            ON allotted_seats (course, college_name, state);
+        ''')
+        # Best colleges: WHERE course = ? [AND state = ?] ORDER BY avg_rank
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ranker_course_rank
+            ON college_ranker (course, avg_rank);
+        ''')
+        conn.commit()
+        conn.close()
+        print(f"Initialized indexes on {database}")
+
+def init_college_scores_db():
+    """Materialized best-college scores and state rollups, plus the triggers that mark them stale.
+
+    The tables themselves are filled by best_colleges.refresh_college_scores()
+    and best_colleges.refresh_state_rollups().
+    """
+    database = "database/medical_allotment.db"
+    if not os.path.exists(database):
+        print(f"Skipped {database} (not found)")
+        return
+    conn = create_connection(database)
+    if conn is not None:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS college_scores (
+                course TEXT NOT NULL,
+                state_key TEXT NOT NULL,
+                sno INTEGER NOT NULL,
+                college_name TEXT,
+                state TEXT,
+                address TEXT,
+                avg_rank REAL,
+                total_seats INTEGER,
+                college_score REAL,
+                PRIMARY KEY (course, state_key, sno)
+            ) WITHOUT ROWID;
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_college_scores_state
+            ON college_scores (state_key, course, sno);
+        ''')
+        # Keyset pagination: ORDER BY college_score DESC, sno (unique per course and state key)
+        cursor.execute("DROP INDEX IF EXISTS idx_college_scores_keyset")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_college_scores_seek
+            ON college_scores (course, state_key, college_score DESC, sno);
+        ''')
+        # Per state x course x quota rollups, filled by best_colleges.refresh_state_rollups()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS state_rollups (
+                course TEXT NOT NULL,
+                quota_key TEXT NOT NULL,
+                state TEXT NOT NULL,
+                total_seats INTEGER,
+                college_count INTEGER,
+                avg_closing_rank REAL,
+                min_closing_rank INTEGER,
+                PRIMARY KEY (course, quota_key, state)
+            ) WITHOUT ROWID;
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS source_version (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            );
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS derived_meta (
+                name TEXT PRIMARY KEY,
+                built_version INTEGER
+            );
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO source_version (name, version) VALUES ('college_data', 1)")
+
+        # Any write to the source tables invalidates the derived ones
+        for table in ("college_ranker", "allotted_seats"):
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE source_version SET version = version + 1 WHERE name = 'college_data';
+                    END;
+                ''')
+        conn.commit()
+        conn.close()
+        print(f"Initialized college scores and state rollups on {database}")
+
+def init_search_index_db():
+    """FTS5 typeahead index over colleges and courses.
+
+    Filled by best_colleges.refresh_search_index() and kept current by the
+    college_data version triggers from init_college_scores_db().
+    """
+    database = "database/medical_allotment.db"
+    if not os.path.exists(database):
+        print(f"Skipped {database} (not found)")
+        return
+    conn = create_connection(database)
+    if conn is not None:
+        cursor = conn.cursor()
+        # Indexes built before the source column existed are dropped and rebuilt
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(search_index)")]
+        if columns and 'source' not in columns:
+            cursor.execute("DROP TABLE search_index")
+            try:
+                cursor.execute("DELETE FROM derived_meta WHERE name = 'search_index'")
+            except sqlite3.OperationalError:
+                pass
+        # Prefix indexes keep short "abc*" lookups off the full term list.
+        # source lists the tables a course appears in ('allotments', 'rankings')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                kind UNINDEXED,
+                label,
+                state,
+                address,
+                source UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '1 2 3'
+            );
+        ''')
+        conn.commit()
+        conn.close()
+        print(f"Initialized search index on {database}")
+
 if __name__ == '__main__':
     init_pyq_weightage_db()
     init_revision_weightage_db()
     init_created_timetable_db()
     init_revision_timetable_db()
+    init_medical_allotment_indexes()
+    init_college_scores_db()
+    init_search_index_db()
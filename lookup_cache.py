@@ -0,0 +1,57 @@
+import os
+import threading
+
+# Dropdown lists (states, courses, categories, quotas) change only when the
+# allotment database is replaced or written, so they are cached per process
+# and reloaded when the database file's fingerprint changes.
+
+_lock = threading.Lock()
+_entries = {}
+_stats = {}
+
+def db_fingerprint(db_path):
+    """(mtime, size) of the database and its WAL file; any write changes it."""
+    fingerprint = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+        except OSError:
+            fingerprint.append(None)
+        else:
+            fingerprint.append((st.st_mtime_ns, st.st_size))
+    return tuple(fingerprint)
+
+def cached(db_path, name, load):
+    """
+    Value of load() for name, reused until db_path changes.
+    Cached values are shared, so callers must not modify them.
+    """
+    fingerprint = db_fingerprint(db_path)
+    entry = _entries.get(name)
+    if entry is not None and entry[0] == fingerprint:
+        with _lock:
+            _stats[name]["hits"] += 1
+        return entry[1]
+
+    value = load()
+    with _lock:
+        _entries[name] = (fingerprint, value)
+        _stats.setdefault(name, {"hits": 0, "misses": 0})["misses"] += 1
+    return value
+
+def cache_stats():
+    """Hit/miss counters per cached list, with totals."""
+    with _lock:
+        per_list = {name: dict(counts) for name, counts in sorted(_stats.items())}
+    hits = sum(c["hits"] for c in per_list.values())
+    misses = sum(c["misses"] for c in per_list.values())
+    return {
+        "lists": per_list,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+    }
+
+def clear():
+    with _lock:
+        _entries.clear()
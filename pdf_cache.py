@@ -0,0 +1,156 @@
+"""
+Disk cache of rendered timetable PDFs.
+
+Identical timetable content renders to an identical PDF, so finished PDFs are
+kept in CACHE_DIR under a hash of the data passed to generate_pdf (plus the
+renderer sources, so a change to the layout never serves stale files). The
+directory is shared by every web worker and export process: files are written
+atomically and evicted least recently used first once the cache outgrows
+MAX_BYTES.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import pdf_generator
+import pdf_parallel
+import timetable_data
+
+CACHE_DIR = os.environ.get("PDF_CACHE_DIR", "database/pdf_cache")
+MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", 256)) * 2**20
+
+# Everything that shapes the PDF: layout, the parallel merge and footer layer,
+# and the day/section data the document is built from
+_RENDERER_MODULES = (pdf_generator, pdf_parallel, timetable_data)
+
+def _renderer_version():
+    digest = hashlib.sha256()
+    for module in _RENDERER_MODULES:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+_RENDERER_VERSION = _renderer_version()
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def cache_key(main_data, rev_data, stats, time_cols):
+    """Hex digest identifying the PDF generate_pdf would render for this data"""
+    payload = json.dumps([main_data, rev_data, stats, time_cols],
+                         sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(_RENDERER_VERSION.encode())
+    digest.update(payload.encode())
+    return digest.hexdigest()
+
+def _path(key):
+    return os.path.join(CACHE_DIR, f"{key}.pdf")
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+def lookup(key):
+    """Path of the cached PDF for key, or None. A hit marks the file recently used."""
+    path = _path(key)
+    try:
+        # mtime doubles as the last-use time for eviction (atime is often disabled)
+        os.utime(path)
+    except OSError:
+        _count("misses")
+        return None
+    _count("hits")
+    return path
+
+def _render(key, main_data, rev_data, stats, time_cols):
+    """
+    Render straight into a temporary file in the cache, publish it under key
+    and trim the cache. Returns the open file, rewound; it stays readable even
+    if another worker evicts the entry.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(key)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    f = open(tmp, "w+b")
+    try:
+        pdf_parallel.generate_pdf(main_data, rev_data, stats, time_cols, output=f)
+        f.flush()
+        os.replace(tmp, path)
+    except BaseException:
+        f.close()
+        os.remove(tmp)
+        raise
+    evict(keep=path)
+    f.seek(0)
+    return f
+
+def evict(keep=None, max_bytes=None):
+    """Delete least recently used PDFs until the cache fits in max_bytes (default MAX_BYTES)."""
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".pdf"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # another worker evicted it first
+            pass
+        else:
+            _count("evictions")
+        total -= size
+
+def open_pdf(main_data, rev_data, stats, time_cols):
+    """
+    Readable binary file with the PDF for this timetable, rendering and caching
+    it on a miss. Either way the PDF is read from disk, never held in memory,
+    and hits are opened straight away so a concurrent eviction cannot remove
+    the file before it is sent.
+    """
+    key = cache_key(main_data, rev_data, stats, time_cols)
+    path = lookup(key)
+    if path is not None:
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            pass
+    return _render(key, main_data, rev_data, stats, time_cols)
+
+def cache_stats():
+    """Hit/miss/eviction counters for this process, with the cache's current size."""
+    with _lock:
+        stats = dict(_stats)
+    files, size = 0, 0
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".pdf"):
+                    files += 1
+                    size += entry.stat().st_size
+    except OSError:
+        pass
+    lookups = stats["hits"] + stats["misses"]
+    stats.update(
+        files=files,
+        bytes=size,
+        max_bytes=MAX_BYTES,
+        hit_rate=round(stats["hits"] / lookups, 4) if lookups else None,
+    )
+    return stats
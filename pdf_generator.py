@@ -7,11 +7,14 @@ from io import BytesIO
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, KeepTogether
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Flowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfgen import canvas
 import random
+import re
 
 # Motivational quotes for PDF pages
 MOTIVATIONAL_QUOTES = [
@@ -49,29 +52,32 @@ MOTIVATIONAL_QUOTES = [
 
 
 class FooterCanvas(canvas.Canvas):
-    """Custom canvas to add page numbers and quotes"""
-    
-    def __init__(self, *args, **kwargs):
-        canvas.Canvas.__init__(self, *args, **kwargs)
-        self.pages = []
-        
+    """Custom canvas to add page numbers and quotes
+
+    Footers are drawn as each page finishes, so no per-page state is kept.
+    "Page X of Y" is a form XObject per page that save() fills in once the
+    total is known.
+    """
+
     def showPage(self):
-        self.pages.append(dict(self.__dict__))
-        self._startPage()
-        
+        page_num = self.getPageNumber()
+        self.draw_page_footer(page_num)
+        self.doForm(f"pageNumber{page_num}")
+        canvas.Canvas.showPage(self)
+
     def save(self):
-        page_count = len(self.pages)
-        for page_num, page in enumerate(self.pages, 1):
-            self.__dict__.update(page)
-            self.draw_page_footer(page_num, page_count)
-            canvas.Canvas.showPage(self)
+        if len(self._code):
+            self.showPage()
+        page_count = self.getPageNumber() - 1
+        for page_num in range(1, page_count + 1):
+            self.beginForm(f"pageNumber{page_num}")
+            self.draw_page_number(page_num, page_count)
+            self.endForm()
         canvas.Canvas.save(self)
-        
-    def draw_page_footer(self, page_num, page_count):
-        """Draw page number and quote in footer"""
+
+    def draw_page_number(self, page_num, page_count):
+        """Page number on the right"""
         page_width = landscape(A4)[0]
-        
-        # Page number on the right
         self.setFont("Helvetica", 9)
         self.setFillColor(colors.HexColor('#64748b'))
         self.drawRightString(
@@ -79,6 +85,10 @@ class FooterCanvas(canvas.Canvas):
             0.4*inch,
             f"Page {page_num} of {page_count}"
         )
+
+    def draw_page_footer(self, page_num):
+        """Draw the quote in the footer"""
+        page_width = landscape(A4)[0]
         
         # Quote centered (skip cover page)
         if page_num > 1:
@@ -93,95 +103,345 @@ class FooterCanvas(canvas.Canvas):
             )
 
 
-def generate_pdf(main_data, rev_data, stats, time_cols):
-    """
-    Generate enhanced PDF with attractive styling
-    
-    Args:
-        main_data: dict with 'days' and 'summary' for main timetable
-        rev_data: dict with 'days' and 'summary' for revision timetable
-        stats: dict with 'total_days', 'main_days', 'rev_days'
-        time_cols: list of time slot strings
-    
-    Returns:
-        BytesIO buffer containing the PDF
+# Schedule grid layout shared by the main and revision sections
+ROWS_PER_PAGE = 12
+DATE_COL_WIDTH = 1.2*inch
+CELL_PADDING = 6
+
+# Cell styles are built once, not per cell
+DATE_CELL_STYLE = ParagraphStyle('DateCell', fontSize=8, fontName='Helvetica-Bold')
+SPECIAL_CELL_STYLE = ParagraphStyle('Special', fontSize=10, fontName='Helvetica-Bold', alignment=TA_CENTER)
+SLOT_CELL_STYLE = ParagraphStyle('Cell', fontSize=7, leading=9)
+
+GRID_LINE_COLOR = colors.HexColor('#cbd5e1')
+GRAND_TEST_COLORS = (colors.HexColor('#fee2e2'), colors.HexColor('#991b1b'))
+WEEKLY_REVISION_COLORS = (colors.HexColor('#d1fae5'), colors.HexColor('#065f46'))
+
+SCHEDULE_THEMES = {
+    'main': {
+        'header': colors.HexColor('#1e40af'),
+        'row_alt': colors.HexColor('#f8fafc'),
+        'summary_header': colors.HexColor('#3b82f6'),
+        'summary_alt': colors.HexColor('#eff6ff'),
+    },
+    'revision': {
+        'header': colors.HexColor('#059669'),
+        'row_alt': colors.HexColor('#f0fdf4'),
+        'summary_header': colors.HexColor('#10b981'),
+        'summary_alt': colors.HexColor('#ecfdf5'),
+    },
+}
+
+# Paragraph markup and entities change what a cell renders; such text takes the Table path
+_MARKUP = re.compile(r'<|&#?\w+;')
+
+
+def _schedule_col_widths(time_cols):
+    remaining_width = landscape(A4)[0] - 1*inch - DATE_COL_WIDTH
+    slot_col_width = remaining_width / len(time_cols)
+    return [DATE_COL_WIDTH] + [slot_col_width] * len(time_cols)
+
+
+def _special_colors(day):
+    return GRAND_TEST_COLORS if 'Grand Test' in day.get('special_label', '') else WEEKLY_REVISION_COLORS
+
+
+def _schedule_table(batch, time_cols, col_widths, theme):
+    """One batch of schedule rows as a platypus Table of Paragraph cells"""
+    table_data = [['Date (Day)'] + time_cols]
+    for day in batch:
+        row = [Paragraph(day['date_display'], DATE_CELL_STYLE)]
+        if day.get('is_special'):
+            # Special day - merge cells
+            row.append(Paragraph(day['special_label'], SPECIAL_CELL_STYLE))
+        else:
+            # Normal day - show subjects
+            for time_slot in time_cols:
+                row.append(Paragraph(day['slots_map'].get(time_slot, '-'), SLOT_CELL_STYLE))
+        table_data.append(row)
+
+    schedule_table = Table(table_data, colWidths=col_widths, repeatRows=1)
+
+    table_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), theme['header']),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), CELL_PADDING),
+        ('TOPPADDING', (0, 0), (-1, -1), CELL_PADDING),
+        ('GRID', (0, 0), (-1, -1), 0.5, GRID_LINE_COLOR),
+        ('BOX', (0, 0), (-1, -1), 1.5, theme['header']),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, theme['row_alt']])
+    ]
+
+    # Handle special days (merged cells)
+    for row_idx, day in enumerate(batch, 1):
+        if day.get('is_special'):
+            background, text_color = _special_colors(day)
+            table_style.append(('SPAN', (1, row_idx), (-1, row_idx)))
+            table_style.append(('BACKGROUND', (1, row_idx), (-1, row_idx), background))
+            table_style.append(('TEXTCOLOR', (1, row_idx), (-1, row_idx), text_color))
+
+    schedule_table.setStyle(TableStyle(table_style))
+    return schedule_table
+
+
+class ScheduleGrid(Flowable):
+    """One batch of schedule rows drawn straight onto the canvas.
+
+    Reproduces the geometry, colours and line breaks of _schedule_table
+    (Paragraph cells in a Table with a repeated header row) without creating
+    a flowable per cell or a style per table.
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=landscape(A4),
-        topMargin=0.6*inch,
-        bottomMargin=0.6*inch,
-        leftMargin=0.5*inch,
-        rightMargin=0.5*inch
-    )
-    
+
+    HEADER_FONT = ('Helvetica-Bold', 9, 12)
+
+    def __init__(self, days, time_cols, col_widths, theme):
+        Flowable.__init__(self)
+        self.hAlign = 'CENTER'
+        self.days = days
+        self.time_cols = time_cols
+        self.col_widths = col_widths
+        self.theme = theme
+        self.col_x = [0]
+        for w in col_widths:
+            self.col_x.append(self.col_x[-1] + w)
+        self.width = self.col_x[-1]
+
+        self.header_height = self.HEADER_FONT[2] + 2*CELL_PADDING
+        self.rows = [self._layout_row(day) for day in days]
+        self.height = self.header_height + sum(row[0] for row in self.rows)
+
+    @staticmethod
+    def can_draw(days):
+        for day in days:
+            texts = [day['date_display'], day.get('special_label', '')] + list(day['slots_map'].values())
+            if any(_MARKUP.search(text) for text in texts):
+                return False
+        return True
+
+    @staticmethod
+    def _lines(text, style, width):
+        return simpleSplit(text, style.fontName, style.fontSize, width - 2*CELL_PADDING)
+
+    def _layout_row(self, day):
+        """(row height, [(x, width, lines, style), ...]) laid out like Paragraph cells"""
+        widths = self.col_widths
+        cells = [(self.col_x[0], widths[0], self._lines(day['date_display'], DATE_CELL_STYLE, widths[0]), DATE_CELL_STYLE)]
+        if day.get('is_special'):
+            span = self.width - self.col_x[1]
+            cells.append((self.col_x[1], span, self._lines(day['special_label'], SPECIAL_CELL_STYLE, span), SPECIAL_CELL_STYLE))
+        else:
+            for col, time_slot in enumerate(self.time_cols, 1):
+                text = day['slots_map'].get(time_slot, '-')
+                cells.append((self.col_x[col], widths[col], self._lines(text, SLOT_CELL_STYLE, widths[col]), SLOT_CELL_STYLE))
+        height = max(len(lines) * style.leading for _, _, lines, style in cells) + 2*CELL_PADDING
+        return height, cells
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Same rule as Table.split with repeatRows=1: whole rows only, never just the header
+        used = self.header_height
+        fits = 0
+        for height, _ in self.rows:
+            if used + height > availHeight:
+                break
+            used += height
+            fits += 1
+        if used > availHeight or fits == 0:
+            return []
+        if fits == len(self.rows):
+            return [self]
+        return [ScheduleGrid(self.days[:fits], self.time_cols, self.col_widths, self.theme),
+                ScheduleGrid(self.days[fits:], self.time_cols, self.col_widths, self.theme)]
+
+    def draw(self):
+        c = self.canv
+        c.saveState()
+        width, col_x = self.width, self.col_x
+
+        # Row bottoms, top to bottom
+        header_y = self.height - self.header_height
+        row_y = []
+        y = header_y
+        for height, _ in self.rows:
+            y -= height
+            row_y.append(y)
+
+        # Backgrounds: header, alternating rows, then special days
+        c.setFillColor(self.theme['header'])
+        c.rect(0, header_y, width, self.header_height, stroke=0, fill=1)
+        for i, ((height, _), y) in enumerate(zip(self.rows, row_y)):
+            if i % 2:
+                c.setFillColor(self.theme['row_alt'])
+                c.rect(0, y, width, height, stroke=0, fill=1)
+        for day, (height, _), y in zip(self.days, self.rows, row_y):
+            if day.get('is_special'):
+                c.setFillColor(_special_colors(day)[0])
+                c.rect(col_x[1], y, width - col_x[1], height, stroke=0, fill=1)
+
+        # Header labels and cell text go through one text object per grid
+        tx = c.beginText()
+        font, size, leading = self.HEADER_FONT
+        tx.setFillColor(colors.whitesmoke)
+        tx.setFont(font, size, leading)
+        text_y = header_y + (self.header_height + leading) / 2.0 - size
+        for x, w, label in zip(col_x, self.col_widths, ['Date (Day)'] + self.time_cols):
+            tx.setTextOrigin(x + (w - stringWidth(label, font, size)) / 2.0, text_y)
+            tx.textOut(label)
+
+        # Cell text: vertically centred blocks of wrapped lines, as Paragraph draws them
+        tx.setFillColor(colors.black)
+        current_font = None
+        for (height, cells), y in zip(self.rows, row_y):
+            for x, w, lines, style in cells:
+                if current_font is not style:
+                    tx.setFont(style.fontName, style.fontSize, style.leading)
+                    current_font = style
+                block = len(lines) * style.leading
+                baseline = y + (height + block) / 2.0 - style.fontSize
+                for line in lines:
+                    if style.alignment == TA_CENTER:
+                        tx.setTextOrigin(x + (w - stringWidth(line, style.fontName, style.fontSize)) / 2.0, baseline)
+                    else:
+                        tx.setTextOrigin(x + CELL_PADDING, baseline)
+                    tx.textOut(line)
+                    baseline -= style.leading
+        c.drawText(tx)
+
+        # Grid, with column lines broken across merged special-day cells
+        c.setLineCap(1)
+        c.setLineJoin(1)
+        c.setStrokeColor(GRID_LINE_COLOR)
+        c.setLineWidth(0.5)
+        segments = [(0, y, width, y) for y in [self.height, header_y] + row_y]
+        segments += [(x, 0, x, self.height) for x in (col_x[0], col_x[1], width)]
+        for x in col_x[2:-1]:
+            top = self.height
+            for day, (height, _), y in zip(self.days, self.rows, row_y):
+                if day.get('is_special'):
+                    if top > y + height:
+                        segments.append((x, y + height, x, top))
+                    top = y
+            if top > 0:
+                segments.append((x, 0, x, top))
+        c.lines(segments)
+
+        c.setStrokeColor(self.theme['header'])
+        c.setLineWidth(1.5)
+        c.rect(0, 0, width, self.height, stroke=1, fill=0)
+        c.restoreState()
+
+
+def _schedule_section(days, time_cols, theme, fast_grid=True):
+    """Schedule flowables, ROWS_PER_PAGE days per page"""
+    elements = []
+    col_widths = _schedule_col_widths(time_cols)
+    for i in range(0, len(days), ROWS_PER_PAGE):
+        batch = days[i:i+ROWS_PER_PAGE]
+        if fast_grid and ScheduleGrid.can_draw(batch):
+            elements.append(ScheduleGrid(batch, time_cols, col_widths, theme))
+        else:
+            elements.append(_schedule_table(batch, time_cols, col_widths, theme))
+        if i + ROWS_PER_PAGE < len(days):
+            elements.append(PageBreak())
+    return elements
+
+
+def _summary_table(summary, theme):
+    summary_data = [['Subject', 'Total Hours']]
+    for subject, hours in summary.items():
+        summary_data.append([subject, str(hours)])
+
+    summary_table = Table(summary_data, colWidths=[4*inch, 1.5*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), theme['summary_header']),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, GRID_LINE_COLOR),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, theme['summary_alt']])
+    ]))
+    return summary_table
+
+
+# Document styles, built once
+_SAMPLE_STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_SAMPLE_STYLES['Heading1'],
+    fontSize=28,
+    textColor=colors.HexColor('#1e3a8a'),
+    spaceAfter=20,
+    spaceBefore=10,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold',
+    leading=34
+)
+
+SUBTITLE_STYLE = ParagraphStyle(
+    'Subtitle',
+    parent=_SAMPLE_STYLES['Normal'],
+    fontSize=14,
+    textColor=colors.HexColor('#475569'),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Oblique'
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_SAMPLE_STYLES['Heading2'],
+    fontSize=18,
+    textColor=colors.HexColor('#1e40af'),
+    spaceAfter=15,
+    spaceBefore=20,
+    fontName='Helvetica-Bold',
+    borderWidth=0,
+    borderPadding=8,
+    borderColor=colors.HexColor('#3b82f6'),
+    borderRadius=4,
+    backColor=colors.HexColor('#eff6ff')
+)
+
+SUBHEADING_STYLE = ParagraphStyle(
+    'SubHeading',
+    parent=_SAMPLE_STYLES['Heading3'],
+    fontSize=14,
+    textColor=colors.HexColor('#059669'),
+    spaceAfter=12,
+    spaceBefore=15,
+    fontName='Helvetica-Bold'
+)
+
+QUOTE_STYLE = ParagraphStyle(
+    'Quote',
+    parent=_SAMPLE_STYLES['Normal'],
+    fontSize=11,
+    textColor=colors.HexColor('#64748b'),
+    alignment=TA_CENTER,
+    fontName='Helvetica-Oblique',
+    spaceAfter=10,
+    spaceBefore=10
+)
+
+
+def _cover_flowables(stats):
     elements = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles with enhanced aesthetics
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=28,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=20,
-        spaceBefore=10,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold',
-        leading=34
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'Subtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#475569'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=18,
-        textColor=colors.HexColor('#1e40af'),
-        spaceAfter=15,
-        spaceBefore=20,
-        fontName='Helvetica-Bold',
-        borderWidth=0,
-        borderPadding=8,
-        borderColor=colors.HexColor('#3b82f6'),
-        borderRadius=4,
-        backColor=colors.HexColor('#eff6ff')
-    )
-    
-    subheading_style = ParagraphStyle(
-        'SubHeading',
-        parent=styles['Heading3'],
-        fontSize=14,
-        textColor=colors.HexColor('#059669'),
-        spaceAfter=12,
-        spaceBefore=15,
-        fontName='Helvetica-Bold'
-    )
-    
-    quote_style = ParagraphStyle(
-        'Quote',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#64748b'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique',
-        spaceAfter=10,
-        spaceBefore=10
-    )
-    
-    # Cover Page
     elements.append(Spacer(1, 1.5*inch))
-    elements.append(Paragraph("NEET PG PREPARATION SCHEDULE", title_style))
-    elements.append(Paragraph("Personalized Study Timetable", subtitle_style))
+    elements.append(Paragraph("NEET PG PREPARATION SCHEDULE", TITLE_STYLE))
+    elements.append(Paragraph("Personalized Study Timetable", SUBTITLE_STYLE))
     elements.append(Spacer(1, 0.5*inch))
     
     # Stats summary on cover
@@ -210,193 +470,102 @@ def generate_pdf(main_data, rev_data, stats, time_cols):
     
     elements.append(stats_table)
     elements.append(Spacer(1, 1*inch))
-    elements.append(Paragraph(f'"{random.choice(MOTIVATIONAL_QUOTES)}"', quote_style))
-    elements.append(PageBreak())
-    
-    # Main Timetable
-    if main_data['days']:
-        elements.append(Paragraph("Part I: Main Timetable", heading_style))
+    elements.append(Paragraph(f'"{random.choice(MOTIVATIONAL_QUOTES)}"', QUOTE_STYLE))
+    return elements
+
+
+def _schedule_part_flowables(days, time_cols, theme_name, heading, fast_grid):
+    elements = []
+    if heading:
+        elements.append(Paragraph(heading, HEADING_STYLE))
         elements.append(Spacer(1, 0.2*inch))
-        
-        # Main schedule table - paginated
-        rows_per_page = 12
-        for i in range(0, len(main_data['days']), rows_per_page):
-            batch = main_data['days'][i:i+rows_per_page]
-            
-            # Create table data
-            table_data = [['Date (Day)'] + time_cols]
-            
-            for day in batch:
-                row = [Paragraph(day['date_display'], ParagraphStyle('DateCell', fontSize=8, fontName='Helvetica-Bold'))]
-                
-                if day.get('is_special'):
-                    # Special day - merge cells
-                    cell_text = day['special_label']
-                    row.append(Paragraph(cell_text, ParagraphStyle('Special', fontSize=10, fontName='Helvetica-Bold', alignment=TA_CENTER)))
-                else:
-                    # Normal day - show subjects
-                    for time_slot in time_cols:
-                        subject = day['slots_map'].get(time_slot, '-')
-                        row.append(Paragraph(subject, ParagraphStyle('Cell', fontSize=7, leading=9)))
-                
-                table_data.append(row)
-            
-            # Calculate column widths
-            date_col_width = 1.2*inch
-            remaining_width = landscape(A4)[0] - 1*inch - date_col_width
-            slot_col_width = remaining_width / len(time_cols)
-            col_widths = [date_col_width] + [slot_col_width] * len(time_cols)
-            
-            schedule_table = Table(table_data, colWidths=col_widths, repeatRows=1)
-            
-            # Enhanced table styling
-            table_style = [
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cbd5e1')),
-                ('BOX', (0, 0), (-1, -1), 1.5, colors.HexColor('#1e40af')),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')])
-            ]
-            
-            # Handle special days (merged cells)
-            for row_idx, day in enumerate(batch, 1):
-                if day.get('is_special'):
-                    table_style.append(('SPAN', (1, row_idx), (-1, row_idx)))
-                    if 'Grand Test' in day.get('special_label', ''):
-                        table_style.append(('BACKGROUND', (1, row_idx), (-1, row_idx), colors.HexColor('#fee2e2')))
-                        table_style.append(('TEXTCOLOR', (1, row_idx), (-1, row_idx), colors.HexColor('#991b1b')))
-                    else:
-                        table_style.append(('BACKGROUND', (1, row_idx), (-1, row_idx), colors.HexColor('#d1fae5')))
-                        table_style.append(('TEXTCOLOR', (1, row_idx), (-1, row_idx), colors.HexColor('#065f46')))
-            
-            schedule_table.setStyle(TableStyle(table_style))
-            elements.append(schedule_table)
-            
-            if i + rows_per_page < len(main_data['days']):
-                elements.append(PageBreak())
-        
-        # Main summary
-        elements.append(PageBreak())
-        elements.append(Paragraph("Main Phase - Subject Breakdown", subheading_style))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        summary_data = [['Subject', 'Total Hours']]
-        for subject, hours in main_data['summary'].items():
-            summary_data.append([subject, str(hours)])
-        
-        summary_table = Table(summary_data, colWidths=[4*inch, 1.5*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e1')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#eff6ff')])
-        ]))
-        
-        elements.append(summary_table)
-        elements.append(PageBreak())
+    elements.extend(_schedule_section(days, time_cols, SCHEDULE_THEMES[theme_name], fast_grid))
+    return elements
+
+
+def _summary_flowables(title, summary, theme_name):
+    return [
+        Paragraph(title, SUBHEADING_STYLE),
+        Spacer(1, 0.1*inch),
+        _summary_table(summary, SCHEDULE_THEMES[theme_name]),
+    ]
+
+
+_SECTION_BUILDERS = {
+    'cover': _cover_flowables,
+    'schedule': _schedule_part_flowables,
+    'summary': _summary_flowables,
+}
+
+
+def document_sections(main_data, rev_data, stats, time_cols, fast_grid=True, chunk_pages=None):
+    """
+    The document as (kind, args) sections in page order. Each section starts
+    on a new page and section_flowables() turns it into flowables; sections
+    are plain data so they can be sent to other processes. Schedules are
+    split every chunk_pages pages when given. A part whose summary is None
+    (a partial export without the breakdown) gets no summary page.
+    """
+    sections = [('cover', (stats,))]
+    parts = [
+        (main_data, 'main', "Part I: Main Timetable", "Main Phase - Subject Breakdown"),
+        (rev_data, 'revision', "Part II: Revision Timetable", "Revision Phase - Subject Breakdown"),
+    ]
+    for data, theme_name, heading, summary_title in parts:
+        days = data['days']
+        if not days:
+            continue
+        step = chunk_pages * ROWS_PER_PAGE if chunk_pages else len(days)
+        for i in range(0, len(days), step):
+            sections.append(('schedule', (days[i:i+step], time_cols, theme_name,
+                                          heading if i == 0 else None, fast_grid)))
+        if data['summary'] is not None:
+            sections.append(('summary', (summary_title, data['summary'], theme_name)))
+    return sections
+
+
+def section_flowables(section):
+    kind, args = section
+    return _SECTION_BUILDERS[kind](*args)
+
+
+def new_document(output):
+    """Landscape A4 document with the timetable margins, rendering into output"""
+    return SimpleDocTemplate(
+        output,
+        pagesize=landscape(A4),
+        topMargin=0.6*inch,
+        bottomMargin=0.6*inch,
+        leftMargin=0.5*inch,
+        rightMargin=0.5*inch
+    )
+
+
+def generate_pdf(main_data, rev_data, stats, time_cols, fast_grid=True, output=None):
+    """
+    Generate enhanced PDF with attractive styling
     
-    # Revision Timetable
-    if rev_data['days']:
-        elements.append(Paragraph("Part II: Revision Timetable", heading_style))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Revision schedule table - paginated
-        rows_per_page = 12
-        for i in range(0, len(rev_data['days']), rows_per_page):
-            batch = rev_data['days'][i:i+rows_per_page]
-            
-            table_data = [['Date (Day)'] + time_cols]
-            
-            for day in batch:
-                row = [Paragraph(day['date_display'], ParagraphStyle('DateCell', fontSize=8, fontName='Helvetica-Bold'))]
-                
-                if day.get('is_special'):
-                    cell_text = day['special_label']
-                    row.append(Paragraph(cell_text, ParagraphStyle('Special', fontSize=10, fontName='Helvetica-Bold', alignment=TA_CENTER)))
-                else:
-                    for time_slot in time_cols:
-                        subject = day['slots_map'].get(time_slot, '-')
-                        row.append(Paragraph(subject, ParagraphStyle('Cell', fontSize=7, leading=9)))
-                
-                table_data.append(row)
-            
-            date_col_width = 1.2*inch
-            remaining_width = landscape(A4)[0] - 1*inch - date_col_width
-            slot_col_width = remaining_width / len(time_cols)
-            col_widths = [date_col_width] + [slot_col_width] * len(time_cols)
-            
-            schedule_table = Table(table_data, colWidths=col_widths, repeatRows=1)
-            
-            table_style = [
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 9),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cbd5e1')),
-                ('BOX', (0, 0), (-1, -1), 1.5, colors.HexColor('#059669')),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0fdf4')])
-            ]
-            
-            for row_idx, day in enumerate(batch, 1):
-                if day.get('is_special'):
-                    table_style.append(('SPAN', (1, row_idx), (-1, row_idx)))
-                    if 'Grand Test' in day.get('special_label', ''):
-                        table_style.append(('BACKGROUND', (1, row_idx), (-1, row_idx), colors.HexColor('#fee2e2')))
-                        table_style.append(('TEXTCOLOR', (1, row_idx), (-1, row_idx), colors.HexColor('#991b1b')))
-                    else:
-                        table_style.append(('BACKGROUND', (1, row_idx), (-1, row_idx), colors.HexColor('#d1fae5')))
-                        table_style.append(('TEXTCOLOR', (1, row_idx), (-1, row_idx), colors.HexColor('#065f46')))
-            
-            schedule_table.setStyle(TableStyle(table_style))
-            elements.append(schedule_table)
-            
-            if i + rows_per_page < len(rev_data['days']):
-                elements.append(PageBreak())
-        
-        # Revision summary
-        elements.append(PageBreak())
-        elements.append(Paragraph("Revision Phase - Subject Breakdown", subheading_style))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        summary_data = [['Subject', 'Total Hours']]
-        for subject, hours in rev_data['summary'].items():
-            summary_data.append([subject, str(hours)])
-        
-        summary_table = Table(summary_data, colWidths=[4*inch, 1.5*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#10b981')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#cbd5e1')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ecfdf5')])
-        ]))
-        
-        elements.append(summary_table)
+    Args:
+        main_data: dict with 'days' and 'summary' for main timetable
+        rev_data: dict with 'days' and 'summary' for revision timetable
+        stats: dict with 'total_days', 'main_days', 'rev_days'
+        time_cols: list of time slot strings
+        fast_grid: draw schedule pages with ScheduleGrid; False uses
+            the Table of Paragraphs path for every page
+        output: writable binary file to render into instead of a new
+            BytesIO, e.g. a temporary file that is then streamed out
+    
+    Returns:
+        output (or the new BytesIO buffer) containing the PDF, rewound
+    """
+    buffer = BytesIO() if output is None else output
+    doc = new_document(buffer)
+    
+    elements = []
+    for section in document_sections(main_data, rev_data, stats, time_cols, fast_grid):
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(section_flowables(section))
     
     # Build PDF
     doc.build(elements, canvasmaker=FooterCanvas)
@@ -0,0 +1,164 @@
+"""
+Background PDF export jobs.
+
+Timetable PDFs are generated and rendered in a process pool so request
+workers return immediately. Job state lives on disk as one JSON file per
+job next to the finished PDF, so any web worker can answer status and
+download requests for a job another worker accepted.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pdf_cache
+from timetable_data import build_timetable, export_filename
+
+EXPORT_DIR = os.environ.get("PDF_EXPORT_DIR", "database/pdf_exports")
+# Render processes per web worker, and jobs each web worker accepts before refusing more
+POOL_SIZE = int(os.environ.get("PDF_EXPORT_WORKERS", 2))
+QUEUE_DEPTH = int(os.environ.get("PDF_EXPORT_QUEUE_DEPTH", 8))
+# Finished jobs and their PDFs are removed after this many seconds
+JOB_TTL = int(os.environ.get("PDF_EXPORT_TTL", 3600))
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class ExportUnavailable(Exception):
+    """This worker cannot take an export job right now; the client should retry."""
+
+class QueueFull(ExportUnavailable):
+    pass
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _job_path(job_id, ext):
+    if not JOB_ID_PATTERN.match(job_id):
+        raise ValueError("Invalid job id")
+    return os.path.join(EXPORT_DIR, f"{job_id}.{ext}")
+
+def _write_state(job_id, **fields):
+    """Merge fields into the job's JSON state, replacing the file atomically."""
+    path = _job_path(job_id, "json")
+    state = job_status(job_id) or {"id": job_id}
+    state.update(fields)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+    return state
+
+def job_status(job_id):
+    """The job's state dict, or None for unknown (or malformed) ids."""
+    try:
+        with open(_job_path(job_id, "json")) as f:
+            return json.load(f)
+    except (ValueError, OSError):
+        return None
+
+def job_pdf_path(job_id):
+    """Path of the finished PDF, or None if the job is not done."""
+    state = job_status(job_id)
+    if not state or state["status"] != "done":
+        return None
+    return _job_path(job_id, "pdf")
+
+
+def render_job(job_id, form_data, export_range=None):
+    """Runs in a pool process: generate the timetable and write its PDF."""
+    _write_state(job_id, status="running", started_at=time.time())
+    try:
+        main_data, rev_data, stats, cols = build_timetable(form_data, export_range)
+        path = _job_path(job_id, "pdf")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with pdf_cache.open_pdf(main_data, rev_data, stats, cols) as src, open(tmp, "wb") as f:
+            shutil.copyfileobj(src, f)
+        os.replace(tmp, path)
+    except Exception as e:
+        _write_state(job_id, status="failed", error=str(e), finished_at=time.time())
+        return
+    _write_state(job_id, status="done", finished_at=time.time())
+
+
+def _record_crash(job_id, executor, future):
+    # render_job records its own errors; this catches a pool process dying mid-job
+    if future.exception() is not None:
+        _write_state(job_id, status="failed", error=str(future.exception()), finished_at=time.time())
+    if isinstance(future.exception(), BrokenProcessPool):
+        _discard_executor(executor)
+
+def _discard_executor(executor):
+    """Drop a broken pool so the next job starts a fresh one."""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: fresh interpreters, so no sqlite handles or held locks leak in from the web worker
+        _executor = ProcessPoolExecutor(max_workers=POOL_SIZE,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def purge_expired(now=None):
+    """Delete job files older than JOB_TTL."""
+    now = now or time.time()
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > JOB_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+def submit_job(form_data, export_range=None):
+    """
+    Queue a PDF export (of export_range only, when given) and return its initial state.
+    Raises QueueFull when this worker already has QUEUE_DEPTH jobs in flight, and
+    ExportUnavailable when the pool has broken (it is replaced for the next job).
+    """
+    with _lock:
+        _pending.difference_update([f for f in _pending if f.done()])
+        if len(_pending) >= QUEUE_DEPTH:
+            raise QueueFull(f"PDF export queue is full ({QUEUE_DEPTH} jobs); try again shortly.")
+
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        purge_expired()
+        job_id = uuid.uuid4().hex
+        state = _write_state(
+            job_id,
+            status="queued",
+            created_at=time.time(),
+            download_name=export_filename(form_data, export_range),
+        )
+        executor = _get_executor()
+        try:
+            future = executor.submit(render_job, job_id, form_data, export_range)
+        except (BrokenProcessPool, RuntimeError):
+            future = None
+        else:
+            _pending.add(future)
+    # Both of these take _lock, and the callback runs at once if the job has already finished
+    if future is None:
+        # A pool process died (or the pool was shut down): the job never started
+        _discard_executor(executor)
+        os.remove(_job_path(job_id, "json"))
+        raise ExportUnavailable("PDF export workers restarted; try again shortly.")
+    future.add_done_callback(lambda f: _record_crash(job_id, executor, f))
+    return state
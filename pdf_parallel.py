@@ -0,0 +1,279 @@
+"""
+Chunked rendering of long timetable PDFs, in parallel where cores allow.
+
+The document's sections (cover, each schedule split into CHUNK_PAGES-page
+chunks, the subject breakdowns) always start on a new page, so each one is
+laid out on its own into a temporary file, without footers: in worker
+processes when WORKERS > 1, otherwise one after another. ReportLab keeps
+every page of a document until save(), so this is what keeps layout memory
+to one chunk however long the plan is.
+
+merge_files then copies the parts into the output a page at a time, writing
+each object as soon as it is reached and keeping only its offset. The quote
+footer and "Page X of Y" depend on a page's position in the whole document,
+so FooterCanvas draws them for each part once the page count is known, and
+every footer page is placed under the matching page as a form XObject. The
+result looks the same as pdf_generator.generate_pdf.
+
+pypdf is optional: without it, or for short plans, generate_pdf falls back
+to the single-document build.
+"""
+
+import gc
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+import pdf_generator
+
+try:
+    from pypdf import PdfReader
+    from pypdf.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject,
+                               NameObject, NumberObject, StreamObject)
+except ImportError:
+    PdfReader = None
+
+# Render processes, schedule pages per chunk, and the schedule length below
+# which one document is built in memory instead of chunks merged from disk
+WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", os.cpu_count() or 1))
+CHUNK_PAGES = int(os.environ.get("PDF_RENDER_CHUNK_PAGES", 25))
+MIN_PAGES = int(os.environ.get("PDF_RENDER_MIN_PAGES", 60))
+
+_executor = None
+_lock = threading.Lock()
+
+
+def render_section(section, path):
+    """Runs in a pool process (or inline): one section into the PDF file path, without footers."""
+    doc = pdf_generator.new_document(path)
+    doc.build(pdf_generator.section_flowables(section))
+    # The document and its pages are reference cycles: free them before the next chunk
+    gc.collect()
+    return path
+
+def _footer_layer(first_page, page_count, total):
+    """A PDF of page_count pages holding only the quote footer and "Page X of total", from first_page on."""
+    buffer = BytesIO()
+    c = pdf_generator.FooterCanvas(buffer, pagesize=landscape(A4))
+    for page_num in range(first_page, first_page + page_count):
+        c.draw_page_footer(page_num)
+        c.draw_page_number(page_num, total)
+        # Plain showPage/save: the numbers are drawn directly, not as forms
+        canvas.Canvas.showPage(c)
+    canvas.Canvas.save(c)
+    return buffer
+
+
+class _StreamingWriter:
+    """Writes PDF objects straight to output, keeping only their offsets."""
+
+    def __init__(self, output):
+        self.output = output
+        self.start = output.tell()
+        self.offsets = [0]
+        output.write(b"%PDF-1.4\n%\x93\x8c\x8b\x9e\n")
+
+    def reserve(self):
+        self.offsets.append(None)
+        return IndirectObject(len(self.offsets) - 1, 0, None)
+
+    def write(self, ref, obj):
+        self.offsets[ref.idnum] = self.output.tell() - self.start
+        self.output.write(f"{ref.idnum} 0 obj\n".encode())
+        obj.write_to_stream(self.output)
+        self.output.write(b"\nendobj\n")
+
+    def add(self, obj):
+        ref = self.reserve()
+        self.write(ref, obj)
+        return ref
+
+    def finish(self, root, info=None):
+        xref = self.output.tell() - self.start
+        self.output.write(f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n".encode())
+        for offset in self.offsets[1:]:
+            self.output.write(f"{offset:010d} 00000 n \n".encode())
+        trailer = DictionaryObject({NameObject("/Size"): NumberObject(len(self.offsets)),
+                                    NameObject("/Root"): root})
+        if info is not None:
+            trailer[NameObject("/Info")] = info
+        self.output.write(b"trailer\n")
+        trailer.write_to_stream(self.output)
+        self.output.write(f"\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+class _PartCopier:
+    """Copies objects of one source PDF into a _StreamingWriter, renumbering references."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.refs = {}
+        self.pending = []
+
+    def copy(self, obj):
+        # Objects reached for the first time get a number now and are written by flush()
+        if isinstance(obj, IndirectObject):
+            if obj.idnum not in self.refs:
+                self.refs[obj.idnum] = self.writer.reserve()
+                self.pending.append(obj)
+            return self.refs[obj.idnum]
+        if isinstance(obj, StreamObject):
+            copied = obj.__class__()
+            copied._data = obj._data
+        elif isinstance(obj, DictionaryObject):
+            copied = DictionaryObject()
+        elif isinstance(obj, ArrayObject):
+            return ArrayObject(self.copy(value) for value in obj)
+        else:
+            return obj
+        for key, value in obj.items():
+            copied[key] = self.copy(value)
+        return copied
+
+    def flush(self):
+        while self.pending:
+            source = self.pending.pop()
+            self.writer.write(self.refs[source.idnum], self.copy(source.get_object()))
+
+
+def _page_with_footer(writer, part, footers, page, footer_page, parent, name="/PageFooter"):
+    # footer_page becomes a form XObject drawn before the page's own content
+    form = DecodedStreamObject()
+    form.set_data(footer_page.get_contents().get_data())
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): footer_page.mediabox,
+        NameObject("/Resources"): footers.copy(footer_page["/Resources"]),
+    })
+    draw = DecodedStreamObject()
+    draw.set_data(f"q {name} Do Q\n".encode())
+
+    copied = DictionaryObject({NameObject("/Parent"): parent})
+    for key, value in page.items():
+        if key not in ("/Parent", "/Resources", "/Contents"):
+            copied[key] = part.copy(value)
+    resources = page["/Resources"]
+    copied_resources = DictionaryObject({key: part.copy(value) for key, value in resources.items()
+                                         if key != "/XObject"})
+    xobjects = DictionaryObject({key: part.copy(value) for key, value in
+                                 (resources["/XObject"] if "/XObject" in resources else {}).items()})
+    xobjects[NameObject(name)] = writer.add(form.flate_encode())
+    copied_resources[NameObject("/XObject")] = xobjects
+    copied[NameObject("/Resources")] = copied_resources
+    contents = page.raw_get("/Contents")
+    if isinstance(contents.get_object(), ArrayObject):
+        contents = list(contents.get_object())
+    else:
+        contents = [contents]
+    copied[NameObject("/Contents")] = ArrayObject([writer.add(draw)] + [part.copy(c) for c in contents])
+    return copied
+
+def merge_files(paths, output):
+    """
+    Concatenate the section PDFs at paths into output and add the document
+    footers. Only one part is open at a time and pages are written as they
+    are copied; beyond that part, memory grows only by the cross-reference
+    offsets.
+    """
+    counts = [len(PdfReader(path).pages) for path in paths]
+    total = sum(counts)
+    writer = _StreamingWriter(output)
+    root, parent = writer.reserve(), writer.reserve()
+    kids, info = ArrayObject(), None
+    first_page = 1
+    for path, count in zip(paths, counts):
+        reader = PdfReader(path)
+        footer_reader = PdfReader(_footer_layer(first_page, count, total))
+        part, footers = _PartCopier(writer), _PartCopier(writer)
+        if info is None and "/Info" in reader.trailer:
+            info = part.copy(reader.trailer.raw_get("/Info"))
+        for page, footer_page in zip(reader.pages, footer_reader.pages):
+            kids.append(writer.add(_page_with_footer(writer, part, footers, page, footer_page, parent)))
+            part.flush()
+            footers.flush()
+        first_page += count
+        # pypdf readers are reference cycles too: free this part's before the next
+        gc.collect()
+    writer.write(parent, DictionaryObject({NameObject("/Type"): NameObject("/Pages"),
+                                           NameObject("/Kids"): kids,
+                                           NameObject("/Count"): NumberObject(total)}))
+    writer.write(root, DictionaryObject({NameObject("/Type"): NameObject("/Catalog"),
+                                         NameObject("/Pages"): parent}))
+    writer.finish(root, info)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _discard_executor(executor):
+    """Drop a broken pool so the next PDF starts a fresh one."""
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+def _render_sections(sections, paths, parallel):
+    if parallel:
+        executor = _get_executor()
+        try:
+            # map submits every section up front, so only the pool itself can fail here:
+            # it is broken, or another thread shut it down after discarding it
+            results = executor.map(render_section, sections, paths)
+        except RuntimeError:
+            _discard_executor(executor)
+        else:
+            try:
+                list(results)
+                return
+            except BrokenProcessPool:
+                # A pool process died; errors raised by the render itself propagate
+                _discard_executor(executor)
+        # Render this PDF here; the next one starts a fresh pool
+    for section, path in zip(sections, paths):
+        render_section(section, path)
+
+def use_chunks(main_data, rev_data):
+    schedule_pages = (len(main_data['days']) + len(rev_data['days'])) / pdf_generator.ROWS_PER_PAGE
+    return PdfReader is not None and schedule_pages >= MIN_PAGES
+
+def generate_pdf(main_data, rev_data, stats, time_cols, output=None, parallel=None):
+    """
+    pdf_generator.generate_pdf, rendered in chunks for long plans.
+    When pypdf is installed and the schedules run to MIN_PAGES pages or more,
+    sections are laid out into temporary files and merged from disk, so peak
+    memory stays flat as the plan grows. parallel forces (True) or skips
+    (False) the worker processes; by default they are used when WORKERS > 1.
+    Forcing parallel also chunks short plans. Without pypdf one document is
+    always built. Inside a pool process (a PDF export job) sections are
+    always rendered in that process, so pools are never nested.
+    """
+    if PdfReader is None or not (parallel or use_chunks(main_data, rev_data)):
+        return pdf_generator.generate_pdf(main_data, rev_data, stats, time_cols, output=output)
+    if multiprocessing.parent_process() is not None:
+        parallel = False
+    elif parallel is None:
+        parallel = WORKERS > 1
+
+    buffer = BytesIO() if output is None else output
+    sections = pdf_generator.document_sections(main_data, rev_data, stats, time_cols,
+                                               chunk_pages=CHUNK_PAGES)
+    with tempfile.TemporaryDirectory(prefix="timetable-pdf-") as tmp:
+        paths = [os.path.join(tmp, f"{i}.pdf") for i in range(len(sections))]
+        _render_sections(sections, paths, parallel)
+        merge_files(paths, buffer)
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,91 @@
+import sqlite3
+
+import numpy as np
+
+from rank_predictor import DB_FILE, MAX_SCORE
+
+NUM_BINS = 512
+MAX_WINDOW = 50
+
+class RankDistribution:
+    """Observed ranks around a score, answered from tables built once at load.
+
+    Ranks are counted into log-spaced bins (about 2% wide) and the counts are
+    accumulated along the score axis, so the histogram for any score window is
+    one row difference. Exact min/max come from sparse tables over the
+    per-score extremes. Every query costs the same regardless of data size.
+    """
+
+    def __init__(self, db_file=DB_FILE):
+        conn = sqlite3.connect(db_file)
+        rows = np.array(conn.execute("SELECT Score, Rank FROM ranks").fetchall(), dtype=np.int64)
+        conn.close()
+        scores, ranks = rows[:, 0], rows[:, 1]
+
+        self.edges = np.unique(np.round(np.geomspace(1, ranks.max() + 1, NUM_BINS + 1)).astype(np.int64))
+        bins = np.searchsorted(self.edges, ranks, side="right") - 1
+
+        counts = np.zeros((MAX_SCORE + 1, len(self.edges) - 1), dtype=np.int32)
+        np.add.at(counts, (scores, bins), 1)
+        # cumulative[s] holds counts for all scores below s
+        self.cumulative = np.zeros((MAX_SCORE + 2, counts.shape[1]), dtype=np.int32)
+        np.cumsum(counts, axis=0, out=self.cumulative[1:])
+
+        per_score_min = np.full(MAX_SCORE + 1, np.iinfo(np.int64).max)
+        per_score_max = np.full(MAX_SCORE + 1, np.iinfo(np.int64).min)
+        np.minimum.at(per_score_min, scores, ranks)
+        np.maximum.at(per_score_max, scores, ranks)
+        self._min_table = self._sparse_table(per_score_min, np.minimum)
+        self._max_table = self._sparse_table(per_score_max, np.maximum)
+
+    @staticmethod
+    def _sparse_table(values, combine):
+        table = [values]
+        width = 1
+        while width * 2 <= len(values):
+            prev = table[-1]
+            table.append(combine(prev[:-width], prev[width:]))
+            width *= 2
+        return table
+
+    @staticmethod
+    def _range_query(table, combine, lo, hi):
+        level = (hi - lo + 1).bit_length() - 1
+        return combine(table[level][lo], table[level][hi - (1 << level) + 1])
+
+    def around(self, score, window=5):
+        lo, hi = max(0, score - window), min(MAX_SCORE, score + window)
+        counts = self.cumulative[hi + 1] - self.cumulative[lo]
+        total = int(counts.sum())
+        result = {"score": score, "window": window, "count": total,
+                  "min": None, "median": None, "max": None, "bins": []}
+        if total == 0:
+            return result
+
+        result["min"] = int(self._range_query(self._min_table, min, lo, hi))
+        result["max"] = int(self._range_query(self._max_table, max, lo, hi))
+
+        # Median: interpolate inside the bin where the running count crosses half
+        running = np.cumsum(counts)
+        b = int(np.searchsorted(running, total / 2))
+        before = running[b - 1] if b else 0
+        bin_lo, bin_hi = max(self.edges[b], result["min"]), min(self.edges[b + 1] - 1, result["max"])
+        result["median"] = int(round(bin_lo + (total / 2 - before) / counts[b] * (bin_hi - bin_lo)))
+
+        nonzero = np.flatnonzero(counts)
+        for i in range(nonzero[0], nonzero[-1] + 1):
+            result["bins"].append({
+                "from": int(self.edges[i]),
+                "to": int(self.edges[i + 1] - 1),
+                "count": int(counts[i]),
+            })
+        return result
+
+
+_distribution = None
+
+def get_rank_distribution():
+    global _distribution
+    if _distribution is None:
+        _distribution = RankDistribution()
+    return _distribution
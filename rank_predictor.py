@@ -1,33 +1,363 @@
-import pandas as pd
+import argparse
+import bisect
+import hashlib
+import json
+import logging
+import os
 import sqlite3
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.linear_model import LinearRegression
-from sklearn.pipeline import make_pipeline
+from datetime import datetime
+
 import numpy as np
 
 DB_FILE = "database/rank_predictor.db"
+MODEL_DIR = "database/rank_models"
+MANIFEST_FILE = os.path.join(MODEL_DIR, "manifest.json")
+ARTIFACT_VERSION = 2
+DEFAULT_YEAR = 2025
+MAX_SCORE = 800
+ENGINES = ("polynomial", "empirical")
+DEFAULT_ENGINE = os.environ.get("RANK_ENGINE", "polynomial")
+BAND_QUANTILES = (10, 50, 90)
+
+logger = logging.getLogger(__name__)
+
+# A mistyped RANK_ENGINE would otherwise fail every prediction that relies on the default
+if DEFAULT_ENGINE not in ENGINES:
+    logger.warning("RANK_ENGINE=%r is not one of %s; using polynomial", DEFAULT_ENGINE, ", ".join(ENGINES))
+    DEFAULT_ENGINE = "polynomial"
 
 class RankPredictor:
-    def __init__(self, degree=3):
+    """Polynomial regression of rank on percentage, fitted on the ranks table.
+
+    Only used by the offline training CLI; requests are served from the
+    artifacts written by train_model().
+    """
+    def __init__(self, degree=3, db_file=DB_FILE):
         self.model = None
         self.degree = degree
+        self.db_file = db_file
         self._train_model()
-    
+
     def _train_model(self):
-        conn = sqlite3.connect(DB_FILE)
-        df = pd.read_sql_query("SELECT Percentage, Rank FROM ranks", conn)
+        # scikit-learn is only needed to fit the model, keep it off the serving path
+        from sklearn.preprocessing import PolynomialFeatures
+        from sklearn.linear_model import LinearRegression
+        from sklearn.pipeline import make_pipeline
+
+        conn = sqlite3.connect(self.db_file)
+        rows = conn.execute("SELECT Percentage, Rank FROM ranks").fetchall()
         conn.close()
-        X = df["Percentage"].values.reshape(-1, 1)
-        y = df["Rank"].values
+        data = np.array(rows, dtype=float)
+        X = data[:, 0].reshape(-1, 1)
+        y = data[:, 1]
         self.model = make_pipeline(PolynomialFeatures(self.degree), LinearRegression())
         self.model.fit(X, y)
-    
+
     def predict_rank(self, percentage):
         pred = self.model.predict(np.array([[percentage]]))
         return max(1, int(round(pred[0])))
 
-# Instantiate one global predictor to avoid retraining
-predictor = RankPredictor()
+    def coefficients(self):
+        """Polynomial coefficients in ascending powers of percentage."""
+        regression = self.model[-1]
+        # PolynomialFeatures emits a bias column whose weight is folded into intercept_
+        return [float(regression.intercept_)] + [float(c) for c in regression.coef_[1:]]
+
+
+def _isotonic_decreasing(values, weights):
+    """Weighted pool-adjacent-violators fit of a non-increasing sequence."""
+    blocks = []  # [mean, weight, length], fitted on -values so blocks must increase
+    for v, w in zip(-values, weights):
+        blocks.append([v, w, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            v2, w2, n2 = blocks.pop()
+            v1, w1, n1 = blocks.pop()
+            blocks.append([(v1 * w1 + v2 * w2) / (w1 + w2), w1 + w2, n1 + n2])
+    return -np.repeat([b[0] for b in blocks], [b[2] for b in blocks])
+
+def fit_empirical(scores, ranks):
+    """Per-score rank quantiles, made monotone in score.
+
+    Returns sorted observed scores, observation counts and one array per
+    entry of BAND_QUANTILES. Each band is an isotonic (non-increasing) fit
+    of the raw per-score quantile, weighted by how many ranks were observed
+    at that score.
+    """
+    order = np.lexsort((ranks, scores))
+    scores, ranks = scores[order], ranks[order]
+    unique_scores, starts, counts = np.unique(scores, return_index=True, return_counts=True)
+
+    raw = np.array([np.percentile(ranks[start:start + n], BAND_QUANTILES)
+                    for start, n in zip(starts, counts)])
+    bands = np.array([_isotonic_decreasing(raw[:, i], counts) for i in range(len(BAND_QUANTILES))])
+    # Each band is non-increasing, so sorting per score keeps that and stops bands crossing
+    bands = np.sort(bands, axis=0)
+
+    fitted = {"scores": unique_scores.tolist(), "counts": counts.tolist()}
+    for q, band in zip(BAND_QUANTILES, bands):
+        fitted[f"p{q}"] = [round(float(v), 2) for v in band]
+    return fitted
+
+
+def source_fingerprint(db_file=DB_FILE):
+    """SHA-256 of the (Score, Rank, Percentage) rows the model is fitted on."""
+    digest = hashlib.sha256()
+    conn = sqlite3.connect(db_file)
+    for row in conn.execute("SELECT Score, Rank, Percentage FROM ranks ORDER BY id"):
+        digest.update(repr(row).encode())
+    conn.close()
+    return digest.hexdigest()
+
+def artifact_key(fingerprint, degree):
+    raw = f"{fingerprint}:{degree}:{ARTIFACT_VERSION}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+def _read_manifest():
+    if not os.path.exists(MANIFEST_FILE):
+        return {"default_year": None, "models": {}}
+    with open(MANIFEST_FILE) as f:
+        return json.load(f)
+
+def _write_manifest(manifest):
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def train_model(year=DEFAULT_YEAR, degree=3, db_file=DB_FILE, force=False):
+    """Fit the model for one exam year and register it as that year's artifact.
+
+    Artifacts are keyed by a hash of the source rows and the degree, so
+    retraining unchanged data reuses the existing file unless force is set.
+    Both engines are stored in the same artifact. Returns the artifact file name.
+    """
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    fingerprint = source_fingerprint(db_file)
+    key = artifact_key(fingerprint, degree)
+    filename = f"rank_model_{year}_{key}.json"
+    path = os.path.join(MODEL_DIR, filename)
+
+    if force or not os.path.exists(path):
+        predictor = RankPredictor(degree, db_file=db_file)
+        percentages = np.arange(MAX_SCORE + 1, dtype=float).reshape(-1, 1) / MAX_SCORE * 100
+        preds = predictor.model.predict(percentages)
+
+        conn = sqlite3.connect(db_file)
+        observed = np.array(conn.execute("SELECT Score, Rank FROM ranks").fetchall(), dtype=float)
+        conn.close()
+
+        artifact = {
+            "version": ARTIFACT_VERSION,
+            "year": year,
+            "degree": degree,
+            "key": key,
+            "source_hash": fingerprint,
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "max_score": MAX_SCORE,
+            "coefficients": predictor.coefficients(),
+            "ranks": [max(1, int(round(p))) for p in preds],
+            "empirical": fit_empirical(observed[:, 0], observed[:, 1]),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(artifact, f)
+        os.replace(tmp_path, path)
+
+    manifest = _read_manifest()
+    manifest["models"][str(year)] = filename
+    if manifest["default_year"] is None or year >= manifest["default_year"]:
+        manifest["default_year"] = year
+    _write_manifest(manifest)
+    return filename
+
+def load_artifact(year=None):
+    """Read the registered artifact for an exam year (default: newest year)."""
+    manifest = _read_manifest()
+    if year is None:
+        year = manifest["default_year"]
+    filename = manifest["models"].get(str(year))
+    if filename is None:
+        raise LookupError(f"No rank model registered for year {year}")
+
+    with open(os.path.join(MODEL_DIR, filename)) as f:
+        artifact = json.load(f)
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise LookupError(f"{filename} has artifact version {artifact.get('version')}, "
+                          f"expected {ARTIFACT_VERSION}; retrain it")
+    return artifact
+
+
+class _ScoreLookup:
+    """Inverse queries over an engine's integer score -> rank table (self.ranks)."""
+
+    _descending = None
+    _rank_array = None
+
+    def predict_scores(self, scores):
+        """Vectorized predict_score over an array of scores already validated to [0, MAX_SCORE]."""
+        scores = np.asarray(scores, dtype=float)
+        if self._rank_array is None:
+            self._rank_array = np.asarray(self.ranks, dtype=np.int64)
+
+        out = np.empty(scores.shape, dtype=np.int64)
+        whole = scores == np.floor(scores)
+        out[whole] = self._rank_array[scores[whole].astype(np.int64)]
+        if not whole.all():
+            preds = self._predict_fractional(scores[~whole])
+            out[~whole] = np.maximum(1, np.rint(preds)).astype(np.int64)
+        return out
+
+    def min_score_for_rank(self, target_rank):
+        """Smallest integer score expected to reach target_rank or better, or None."""
+        if self._descending is None:
+            # Running minimum makes the table non-increasing in score, so a better
+            # rank at a lower score carries forward; negate it for bisect
+            best = list(self.ranks)
+            for s in range(1, len(best)):
+                best[s] = min(best[s], best[s - 1])
+            self._descending = [-r for r in best]
+        score = bisect.bisect_left(self._descending, -target_rank)
+        return score if score <= MAX_SCORE else None
+
+
+class RankTable(_ScoreLookup):
+    """Polynomial engine: array index for integer scores, Horner otherwise."""
+
+    def __init__(self, coefficients, ranks):
+        self.coefficients = coefficients
+        self.ranks = ranks
+
+    def predict_rank(self, percentage):
+        pred = 0.0
+        for c in reversed(self.coefficients):
+            pred = pred * percentage + c
+        return max(1, int(round(pred)))
+
+    def predict_score(self, score):
+        if score == int(score):
+            return self.ranks[int(score)]
+        return self.predict_rank((score / MAX_SCORE) * 100)
+
+    def _predict_fractional(self, scores):
+        # np.polyval wants the highest power first
+        return np.polyval(self.coefficients[::-1], scores / MAX_SCORE * 100)
+
+    def predict_band(self, score):
+        # A single regression gives no spread, the band collapses onto the point estimate
+        rank = self.predict_score(score)
+        return {f"p{q}": rank for q in BAND_QUANTILES}
+
+
+class EmpiricalRankTable(_ScoreLookup):
+    """Empirical engine: monotone interpolation of observed per-score rank quantiles.
+
+    Scores outside the observed range are clamped to the nearest observed score.
+    """
+
+    def __init__(self, empirical):
+        self.scores = np.asarray(empirical["scores"], dtype=float)
+        self.bands = {q: np.asarray(empirical[f"p{q}"], dtype=float) for q in BAND_QUANTILES}
+        # Integer scores are the common case, resolve them once up front
+        self.ranks = [self._interpolate(self.bands[50], s) for s in range(MAX_SCORE + 1)]
+
+    def _interpolate(self, band, score):
+        score = min(max(score, self.scores[0]), self.scores[-1])
+        hi = int(np.searchsorted(self.scores, score))
+        if self.scores[hi] == score:
+            value = band[hi]
+        else:
+            lo = hi - 1
+            t = (score - self.scores[lo]) / (self.scores[hi] - self.scores[lo])
+            value = band[lo] + t * (band[hi] - band[lo])
+        return max(1, int(round(value)))
+
+    def predict_rank(self, percentage):
+        return self.predict_score(percentage / 100 * MAX_SCORE)
+
+    def _predict_fractional(self, scores):
+        # np.interp clamps to the end values, matching _interpolate
+        return np.interp(scores, self.scores, self.bands[50])
+
+    def predict_score(self, score):
+        if score == int(score) and 0 <= score <= MAX_SCORE:
+            return self.ranks[int(score)]
+        return self._interpolate(self.bands[50], score)
+
+    def predict_band(self, score):
+        return {f"p{q}": self._interpolate(band, score) for q, band in self.bands.items()}
+
+
+# Loaded on first use, one entry per (exam year, engine)
+_tables = {}
+
+def get_rank_table(year=None, engine=None):
+    year = year or os.environ.get("RANK_MODEL_YEAR")
+    year = str(year) if year else None
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown rank engine {engine!r}")
+
+    if (year, engine) not in _tables:
+        artifact = load_artifact(year)
+        if engine == "empirical":
+            table = EmpiricalRankTable(artifact["empirical"])
+        else:
+            table = RankTable(artifact["coefficients"], artifact["ranks"])
+        _tables[year, engine] = table
+    return _tables[year, engine]
+
+def predict_rank(percentage, year=None, engine=None):
+    return get_rank_table(year, engine).predict_rank(percentage)
+
+def predict_rank_for_score(score, year=None, engine=None):
+    return get_rank_table(year, engine).predict_score(score)
+
+def predict_rank_band(score, year=None, engine=None):
+    """p10/p50/p90 ranks for a score; the polynomial engine returns its point estimate."""
+    return get_rank_table(year, engine).predict_band(score)
+
+def predict_ranks_for_scores(scores, year=None, engine=None):
+    """Ranks for a batch of scores in one vectorized call, in input order."""
+    return get_rank_table(year, engine).predict_scores(scores)
+
+def min_score_for_ranks(target_ranks, year=None, engine=None):
+    """Minimum score (and percentage) expected to reach each target rank."""
+    table = get_rank_table(year, engine)
+    results = []
+    for target in target_ranks:
+        score = table.min_score_for_rank(target)
+        results.append({
+            "target_rank": target,
+            "min_score": score,
+            "percentage": None if score is None else round(score / MAX_SCORE * 100, 3),
+            "expected_rank": None if score is None else table.predict_score(score),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and manage rank predictor models.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="fit a model for one exam year")
+    train.add_argument("--year", type=int, default=DEFAULT_YEAR)
+    train.add_argument("--degree", type=int, default=3)
+    train.add_argument("--db", default=DB_FILE, help="ranks database for that year")
+    train.add_argument("--force", action="store_true", help="refit even if the artifact exists")
+
+    sub.add_parser("list", help="show registered models")
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        filename = train_model(args.year, args.degree, args.db, args.force)
+        print(f"{args.year}: {os.path.join(MODEL_DIR, filename)}")
+    else:
+        manifest = _read_manifest()
+        for year, filename in sorted(manifest["models"].items()):
+            marker = "*" if int(year) == manifest["default_year"] else " "
+            print(f"{marker} {year}: {filename}")
+
 
-def predict_rank(percentage):
-    return predictor.predict_rank(percentage)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+gzip/brotli compression of responses.
+
+Dynamic text responses (pages, JSON, CSV and ICS exports) are compressed in
+an after_request hook, in whichever encoding the client prefers. Buffered
+responses smaller than MIN_SIZE are left alone. Streamed responses are
+collected into blocks of STREAM_BLOCK_SIZE bytes, and each block is
+compressed and flushed, so a streamed page still reaches the browser as it is
+generated without paying a flush per template fragment. A template can flush
+earlier, before a slow section, with {{ compression_flush }}.
+
+Static files are never compressed per request. Run
+
+    python response_compression.py precompress
+
+after building the CSS to write .br and .gz copies next to each asset; the
+static route serves those to clients that accept them. brotli is optional:
+without it everything falls back to gzip.
+"""
+
+import argparse
+import mimetypes
+import os
+import zlib
+
+from flask import request, send_from_directory
+from markupsafe import Markup
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smallest buffered body worth compressing, and compression levels for
+# per-request (fast) and build-time (smallest output) compression
+MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 500))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+# Streamed output is compressed and flushed in blocks of this many bytes, or
+# wherever a template emits FLUSH_MARKER
+STREAM_BLOCK_SIZE = int(os.environ.get("COMPRESS_STREAM_BLOCK_SIZE", 8192))
+FLUSH_MARKER = "<!-- flush -->"
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+STATIC_EXTENSIONS = (".css", ".js", ".json", ".svg", ".html", ".txt")
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def _encodings():
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def _negotiate(encodings):
+    # Highest q-value wins; ties go to the earlier (smaller output) encoding
+    return request.accept_encodings.best_match(encodings)
+
+def _compressible(response):
+    mimetype = response.mimetype or ""
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding, level=None):
+    """data compressed whole in encoding ('br' or 'gzip')."""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    compressor = zlib.compressobj(GZIP_LEVEL if level is None else level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+def _compress_chunks(body, encoding):
+    """
+    Compress a streamed response body in blocks of STREAM_BLOCK_SIZE bytes,
+    flushing after each block and after any chunk holding FLUSH_MARKER.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        process, flush, finish = (compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+                                  compressor.flush)
+    marker = FLUSH_MARKER.encode()
+    block, size = [], 0
+    try:
+        for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if not chunk:
+                continue
+            block.append(chunk)
+            size += len(chunk)
+            if size >= STREAM_BLOCK_SIZE or marker in chunk:
+                yield process(b"".join(block)) + flush()
+                block, size = [], 0
+        yield process(b"".join(block)) + finish()
+    finally:
+        # Werkzeug closes the replacement iterable, so pass that on to the original
+        if hasattr(body, "close"):
+            body.close()
+
+
+def compress_response(response):
+    """after_request hook: compress text responses the client accepts compressed."""
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or not _compressible(response)):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _negotiate(_encodings())
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    if response.headers.get("ETag"):
+        # The compressed body is a different representation of the same resource
+        response.set_etag(response.get_etag()[0], weak=True)
+    return response
+
+
+def init_app(app):
+    """Compress app's dynamic responses and serve precompressed static files."""
+    app.after_request(compress_response)
+    app.jinja_env.globals["compression_flush"] = Markup(FLUSH_MARKER)
+    send_static = app.view_functions["static"]
+
+    def static(filename):
+        path = safe_join(app.static_folder, filename)
+        if path and os.path.isfile(path):
+            mtime = os.path.getmtime(path)
+            encodings = [e for e in _encodings()
+                         if os.path.isfile(path + SUFFIXES[e])
+                         and os.path.getmtime(path + SUFFIXES[e]) >= mtime]
+            if encodings:
+                encoding = _negotiate(encodings)
+                if encoding:
+                    response = send_from_directory(app.static_folder, filename + SUFFIXES[encoding],
+                                                   mimetype=mimetypes.guess_type(filename)[0])
+                    response.headers["Content-Encoding"] = encoding
+                else:
+                    response = send_static(filename=filename)
+                response.vary.add("Accept-Encoding")
+                return response
+        return send_static(filename=filename)
+
+    app.view_functions["static"] = static
+
+
+def precompress(directory, force=False):
+    """Write .br and .gz copies of the text assets under directory; returns the files written."""
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) < MIN_SIZE:
+                continue
+            mtime = os.path.getmtime(path)
+            for encoding in _encodings():
+                target = path + SUFFIXES[encoding]
+                if not force and os.path.isfile(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                compressed = compress(data, encoding, level=11 if encoding == "br" else 9)
+                if len(compressed) >= len(data):
+                    continue
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+                written.append((target, len(data), len(compressed)))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompress static assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("precompress", help="write .br/.gz copies of static text assets")
+    build.add_argument("directory", nargs="?", default="static")
+    build.add_argument("--force", action="store_true", help="rewrite copies that are up to date")
+
+    args = parser.parse_args(argv)
+    for target, size, compressed in precompress(args.directory, args.force):
+        print(f"{target}: {size} -> {compressed} bytes")
+
+
+if __name__ == "__main__":
+    main()
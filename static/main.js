@@ -63,7 +63,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
         // Form validation
         rankForm.addEventListener("submit", function (e) {
-            const course = document.querySelector("select[name='course']");
+            const course = document.querySelector("[name='course']");
             const quota = document.querySelector("select[name='quota']");
             const category = document.querySelector("select[name='category']");
             const rankInput = document.querySelector("input[name='my_rank']");
@@ -86,6 +86,269 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
 
+    // ===== RANK DISTRIBUTION SLIDER (rank predictor page) =====
+    const distPanel = document.getElementById("rank-distribution");
+    if (distPanel) {
+        const slider = document.getElementById("dist-score");
+        const scoreLabel = document.getElementById("dist-score-label");
+        const bars = document.getElementById("dist-bars");
+        const fmt = n => (n === null ? "-" : n.toLocaleString("en-IN"));
+        let pending = null;
+
+        function renderDistribution(data) {
+            document.getElementById("dist-min").textContent = fmt(data.min);
+            document.getElementById("dist-median").textContent = fmt(data.median);
+            document.getElementById("dist-max").textContent = fmt(data.max);
+            document.getElementById("dist-count").textContent = data.count
+                ? `${data.count} past results between scores ${Math.max(0, data.score - data.window)} and ${Math.min(800, data.score + data.window)}`
+                : "No past results recorded near this score.";
+
+            bars.innerHTML = "";
+            const peak = Math.max(1, ...data.bins.map(b => b.count));
+            data.bins.forEach(b => {
+                const bar = document.createElement("div");
+                bar.className = "flex-1 bg-emerald-500 rounded-t";
+                bar.style.height = `${Math.max(2, (b.count / peak) * 100)}%`;
+                bar.title = `Rank ${fmt(b.from)} - ${fmt(b.to)}: ${b.count}`;
+                bars.appendChild(bar);
+            });
+        }
+
+        function loadDistribution() {
+            const score = slider.value;
+            scoreLabel.textContent = score;
+            if (pending) pending.abort();
+            pending = new AbortController();
+
+            fetch(`${distPanel.dataset.endpoint}?score=${score}&window=5`, { signal: pending.signal })
+                .then(response => response.json())
+                .then(renderDistribution)
+                .catch(err => {
+                    if (err.name !== "AbortError") console.error("Error loading rank distribution:", err);
+                });
+        }
+
+        slider.addEventListener("input", loadDistribution);
+        loadDistribution();
+    }
+
+
+    // ===== TYPEAHEAD SEARCH (course and college inputs) =====
+    document.querySelectorAll("input[data-typeahead]").forEach(input => {
+        const datalist = document.getElementById(input.getAttribute("list"));
+        if (!datalist) return;
+        const placeholder = input.placeholder;
+        let timer = null;
+        let lastQuery = null;
+
+        function load(query) {
+            if (query === lastQuery) return;
+            lastQuery = query;
+            // An empty query lists the first entries of this kind, so focus shows a dropdown
+            const params = new URLSearchParams({ q: query, kind: input.dataset.kind, limit: query ? 20 : 200 });
+            if (input.dataset.source) params.set("source", input.dataset.source);
+            fetch(`${input.dataset.typeahead}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (query !== lastQuery) return;
+                    // Say so when the list on focus is cut off rather than hiding the rest
+                    input.placeholder = data.more && !query
+                        ? `Showing the first ${data.results.length}; type to search`
+                        : placeholder;
+                    datalist.replaceChildren(...(data.results || []).map(result => {
+                        const opt = document.createElement("option");
+                        opt.value = result.label;
+                        if (result.state) {
+                            opt.label = result.address ? `${result.state} · ${result.address}` : result.state;
+                        }
+                        return opt;
+                    }));
+                })
+                .catch(err => console.error("Error searching:", err));
+        }
+
+        input.addEventListener("focus", () => load(input.value.trim()));
+        input.addEventListener("input", () => {
+            const value = input.value.trim();
+            // Picking an exact option submits the filter form, like the old select did
+            const picked = Array.from(datalist.options).some(opt => opt.value === input.value);
+            if (picked && "submitOnPick" in input.dataset && input.form) {
+                input.form.submit();
+                return;
+            }
+            if (picked) {
+                input.dispatchEvent(new Event("change"));
+                return;
+            }
+            clearTimeout(timer);
+            timer = setTimeout(() => load(value), 120);
+        });
+    });
+
+
+    // ===== BEST COLLEGES INFINITE SCROLL =====
+    const collegeSentinel = document.getElementById("college-rows-sentinel");
+    const collegeRows = document.getElementById("college-rows");
+    if (collegeSentinel && collegeRows && "IntersectionObserver" in window) {
+        // Cell classes mirror the server-rendered rows in best_colleges.html
+        const cellClasses = [
+            "table-cell text-center font-mono text-slate-500",
+            "table-cell font-semibold text-slate-200 group-hover:text-white transition-colors",
+            "table-cell font-medium text-slate-400",
+            "table-cell text-center font-bold text-accent-amber font-mono",
+            "table-cell text-center text-slate-400",
+            "table-cell text-center text-xs font-mono text-slate-500",
+        ];
+        let loading = false;
+
+        function appendColleges(rows) {
+            const fragment = document.createDocumentFragment();
+            rows.forEach(([sno, name, state, course, address, avgRank, seats, score]) => {
+                const tr = document.createElement("tr");
+                tr.className = "table-row group hover:bg-dark-700/50";
+                [sno, name, state, avgRank, seats, score].forEach((value, i) => {
+                    const td = document.createElement("td");
+                    td.className = cellClasses[i];
+                    td.textContent = value;
+                    tr.appendChild(td);
+                });
+                fragment.appendChild(tr);
+            });
+            collegeRows.appendChild(fragment);
+        }
+
+        const observer = new IntersectionObserver(entries => {
+            if (!entries[0].isIntersecting || loading) return;
+            loading = true;
+
+            const params = new URLSearchParams({
+                course: collegeSentinel.dataset.course,
+                state: collegeSentinel.dataset.state,
+                cursor: collegeSentinel.dataset.cursor,
+            });
+            fetch(`${collegeSentinel.dataset.endpoint}?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    appendColleges(data.rows || []);
+                    if (data.next_cursor) {
+                        collegeSentinel.dataset.cursor = data.next_cursor;
+                    } else {
+                        observer.disconnect();
+                        collegeSentinel.remove();
+                    }
+                })
+                .catch(err => {
+                    console.error("Error loading colleges:", err);
+                    showPopup("Could not load more colleges. Please try again.");
+                })
+                .finally(() => {
+                    loading = false;
+                });
+        }, { rootMargin: "400px" });
+
+        observer.observe(collegeSentinel);
+    }
+
+
+    // ===== TIMETABLE MONTHS (timetable result page) =====
+    const dayNames = ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"];
+
+    // Expand one compact month payload into rows matching the old server-rendered ones
+    function timetableRows(data, cols) {
+        const fragment = document.createDocumentFragment();
+        // Run-length pairs -> one subject code per (day, payload column)
+        const codes = [];
+        for (let i = 0; i < data.slots.length; i += 2) {
+            for (let n = 0; n < data.slots[i + 1]; n++) codes.push(data.slots[i]);
+        }
+        const colIndex = cols.map(col => data.cols.indexOf(col));
+        const [year, month] = data.month.split("-").map(Number);
+
+        data.days.forEach((dayOfMonth, i) => {
+            const date = `${data.month}-${String(dayOfMonth).padStart(2, "0")}`;
+            const weekday = dayNames[new Date(Date.UTC(year, month - 1, dayOfMonth)).getUTCDay()];
+            const label = data.special[i];
+            const grandTest = label && label.includes("Grand Test");
+
+            const tr = document.createElement("tr");
+            tr.className = (label ? (grandTest ? "bg-red-900/30" : "bg-emerald-900/30") : "hover:bg-dark-800") + " transition-colors";
+            const dateCell = document.createElement("td");
+            dateCell.className = "px-3 py-2 font-semibold text-slate-300 sticky left-0 bg-dark-900 whitespace-nowrap";
+            dateCell.textContent = `${date} (${weekday})`;
+            tr.appendChild(dateCell);
+
+            if (label) {
+                const td = document.createElement("td");
+                td.colSpan = cols.length;
+                td.className = "px-3 py-3 text-center font-bold uppercase tracking-wide " + (grandTest ? "text-red-400" : "text-emerald-400");
+                td.textContent = label;
+                tr.appendChild(td);
+            } else {
+                const offset = i * data.cols.length;
+                colIndex.forEach(c => {
+                    const code = c < 0 ? -1 : codes[offset + c];
+                    const td = document.createElement("td");
+                    td.className = "px-2 py-2 text-center text-slate-400 text-xs";
+                    td.textContent = code < 0 ? "-" : data.subjects[code];
+                    tr.appendChild(td);
+                });
+            }
+            fragment.appendChild(tr);
+        });
+        return fragment;
+    }
+
+    document.querySelectorAll("[data-timetable-days]").forEach(tbody => {
+        const sentinel = tbody.closest("table").parentElement.querySelector("[data-timetable-sentinel]");
+        const cols = JSON.parse(tbody.dataset.cols);
+        let nextMonth = "";
+        let loading = false;
+        let observer = null;
+
+        function finish() {
+            if (observer) observer.disconnect();
+            sentinel.remove();
+        }
+
+        function loadMonth() {
+            if (loading) return;
+            loading = true;
+            const query = nextMonth ? `?month=${nextMonth}` : "";
+            fetch(tbody.dataset.endpoint + query)
+                .then(response => response.ok ? response.json() : Promise.reject(response.status))
+                .then(data => {
+                    tbody.appendChild(timetableRows(data, cols));
+                    nextMonth = data.next_month;
+                    loading = false;
+                    if (!nextMonth) {
+                        finish();
+                    } else if (observer) {
+                        // Re-observing reports the sentinel again if it is still in view
+                        observer.unobserve(sentinel);
+                        observer.observe(sentinel);
+                    } else {
+                        loadMonth();
+                    }
+                })
+                .catch(err => {
+                    console.error("Error loading timetable:", err);
+                    sentinel.textContent = "Could not load the schedule. Please reload the page.";
+                    if (observer) observer.disconnect();
+                });
+        }
+
+        if ("IntersectionObserver" in window) {
+            observer = new IntersectionObserver(entries => {
+                if (entries[0].isIntersecting) loadMonth();
+            }, { rootMargin: "600px" });
+            observer.observe(sentinel);
+        } else {
+            // No lazy loading available: fetch every month in turn
+            loadMonth();
+        }
+    });
+
+
     // ===== NUMBER INPUT ENHANCEMENTS =====
     document.querySelectorAll('input[type="number"]').forEach(input => {
         // Prevent scroll wheel from changing number inputs
@@ -0,0 +1,348 @@
+"""
+Timetable generation and the day-by-slot view used by the result page,
+the PDF download and the background PDF export jobs.
+"""
+
+import calendar
+from datetime import datetime, timedelta
+
+from logic_main import generate_main_timetable
+from logic_revision import generate_revision_timetable
+from models import get_db_connection, TIMETABLE_DB, REV_TIMETABLE_DB
+
+
+def parse_timetable_form(form):
+    """Timetable options from the generator form (or the PDF form that echoes it)"""
+    return {
+        'from_date': form['from_date'],
+        'to_date': form['to_date'],
+        'revision_days': int(form.get('revision_days', 0)),
+        'daily_hours': int(form['daily_hours']),
+        'time_slots': form.getlist('time_slots'),
+        'grant_test_frequency': form.get('grant_test_frequency', 'once_weekly'),
+        'method': form.get('method', 'subject_completion_wise'),
+        # Set when the form echoes a plan that was already generated
+        'main_id': form.get('main_id', type=int),
+        'rev_id': form.get('rev_id', type=int),
+    }
+
+
+def plan_stats(form_data):
+    """Day counts of the plan and its phases, from the dates alone"""
+    start_date = datetime.strptime(form_data['from_date'], '%Y-%m-%d').date()
+    end_date = datetime.strptime(form_data['to_date'], '%Y-%m-%d').date()
+    total_days = (end_date - start_date).days + 1
+    if total_days <= 60:
+        # ONLY Revision Timetable
+        return {'total_days': total_days, 'main_days': 0, 'rev_days': total_days}
+    main_days = total_days - form_data['revision_days']
+    # Revision runs from the day after the main phase to the day before the end date
+    return {'total_days': total_days, 'main_days': main_days, 'rev_days': total_days - main_days - 1}
+
+
+def generate_timetables(form_data):
+    """
+    Generate the main and revision timetables for the given options.
+    Returns (main_timetable_id, rev_timetable_id, stats); main_timetable_id
+    is None for plans of 60 days or less, which are revision only.
+    """
+    start_date = datetime.strptime(form_data['from_date'], '%Y-%m-%d').date()
+    end_date = datetime.strptime(form_data['to_date'], '%Y-%m-%d').date()
+    selected_slots = form_data['time_slots']
+    daily_hours = form_data['daily_hours']
+    stats = plan_stats(form_data)
+
+    main_timetable_id = None
+    if stats['total_days'] <= 60:
+        # ONLY Revision Timetable
+        rev_timetable_id = generate_revision_timetable(start_date, end_date, selected_slots, daily_hours)
+    else:
+        # Both Main and Revision
+        main_end = start_date + timedelta(days=stats['main_days'] - 1)
+        rev_start = main_end + timedelta(days=1)
+        rev_end_actual = end_date - timedelta(days=1)
+
+        main_timetable_id = generate_main_timetable(start_date, main_end, selected_slots,
+                                                    form_data['grant_test_frequency'], form_data['method'],
+                                                    form_data['revision_days'])
+        rev_timetable_id = generate_revision_timetable(rev_start, rev_end_actual, selected_slots, daily_hours)
+
+    return main_timetable_id, rev_timetable_id, stats
+
+
+def _slots_table(is_revision):
+    return (REV_TIMETABLE_DB, 'rev_timetable_id') if is_revision else (TIMETABLE_DB, 'timetable_id')
+
+
+def _group_days(rows, is_revision):
+    """Day dicts from slot rows ordered by date and start time"""
+    current_date = None
+    current_day_obj = None
+
+    for r in rows:
+        d_str = r['slot_date']
+
+        if d_str != current_date:
+            if current_day_obj:
+                yield current_day_obj
+
+            dt = datetime.strptime(d_str, '%Y-%m-%d')
+            day_name = dt.strftime('%A')
+            friendly_date = f"{d_str} ({day_name})"
+
+            current_day_obj = {
+                'date': d_str,
+                'date_display': friendly_date,
+                'is_special': False,
+                'special_label': '',
+                'slots_map': {}
+            }
+            current_date = d_str
+
+        subj = r['subject']
+        time_key = f"{r['start_time']}-{r['end_time']}"
+
+        if is_revision:
+            if "Grand Test" in subj:
+                current_day_obj['is_special'] = True
+                current_day_obj['special_label'] = "Grand Test"
+            elif "Weekly Revision" in subj:
+                current_day_obj['is_special'] = True
+                current_day_obj['special_label'] = "Weekly Revision"
+
+        current_day_obj['slots_map'][time_key] = subj
+
+    if current_day_obj:
+        yield current_day_obj
+
+
+def process_data_matrix(timetable_id, is_revision=False, date_from=None, date_to=None):
+    """
+    Slots of one timetable grouped into days ({'days': [...], 'summary': {subject: slots}}).
+    date_from/date_to (YYYY-MM-DD, inclusive, either may be None) limit the
+    query, and so the days and summary, to that range.
+    """
+    if not timetable_id:
+        return {'days': [], 'summary': {}}
+
+    db_file, id_col = _slots_table(is_revision)
+    query = f"SELECT * FROM TimetableSlots WHERE {id_col} = ?"
+    params = [timetable_id]
+    if date_from:
+        query += " AND slot_date >= ?"
+        params.append(date_from)
+    if date_to:
+        query += " AND slot_date <= ?"
+        params.append(date_to)
+    with get_db_connection(db_file) as conn:
+        cur = conn.cursor()
+        cur.execute(query + " ORDER BY slot_date, start_time", params)
+        rows = cur.fetchall()
+
+        # Summary
+        counts = {}
+        for r in rows:
+            s = r['subject']
+            if s not in counts: counts[s] = 0
+            counts[s] += 1
+
+        sorted_summary = dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+        return {'days': list(_group_days(rows, is_revision)), 'summary': sorted_summary}
+
+
+def subject_summary(timetable_id, is_revision=False):
+    """process_data_matrix's summary (slots per subject, most first) as one aggregate query"""
+    if not timetable_id:
+        return {}
+    db_file, id_col = _slots_table(is_revision)
+    with get_db_connection(db_file) as conn:
+        # Ties keep first-appearance order, as in the stable sort of process_data_matrix
+        rows = conn.execute(f"""
+            SELECT subject, COUNT(*) AS slots FROM TimetableSlots
+            WHERE {id_col} = ?
+            GROUP BY subject
+            ORDER BY slots DESC, MIN(slot_date || ' ' || start_time)
+        """, (timetable_id,)).fetchall()
+    return {r['subject']: r['slots'] for r in rows}
+
+
+def month_payload(timetable_id, is_revision=False, month=None):
+    """
+    One calendar month (YYYY-MM, default the first) of a timetable in compact
+    form for the result page to render: the slot columns, a dictionary of the
+    month's subjects, day-of-month numbers, special day labels by day index,
+    and slots as flat [code, run length, ...] pairs over days x cols, where
+    code indexes subjects and -1 is an empty slot. next_month is the next
+    month with days, or None. Returns None for unknown timetables.
+    """
+    if not timetable_id:
+        return None
+    db_file, id_col = _slots_table(is_revision)
+    with get_db_connection(db_file) as conn:
+        first_date = conn.execute(f"SELECT MIN(slot_date) FROM TimetableSlots WHERE {id_col} = ?",
+                                  (timetable_id,)).fetchone()[0]
+        if first_date is None:
+            return None
+        first = datetime.strptime(month or first_date[:7], '%Y-%m').date()
+        following = (first + timedelta(days=32)).replace(day=1)
+        rows = conn.execute(f"SELECT slot_date, start_time, end_time, subject FROM TimetableSlots "
+                            f"WHERE {id_col} = ? AND slot_date >= ? AND slot_date < ? "
+                            f"ORDER BY slot_date, start_time",
+                            (timetable_id, first.isoformat(), following.isoformat()))
+        days = list(_group_days(rows, is_revision))
+        next_date = conn.execute(f"SELECT MIN(slot_date) FROM TimetableSlots "
+                                 f"WHERE {id_col} = ? AND slot_date >= ?",
+                                 (timetable_id, following.isoformat())).fetchone()[0]
+
+    cols = sorted({key for day in days for key in day['slots_map']})
+    codes = {}
+    slots = []
+    for day in days:
+        for col in cols:
+            subject = day['slots_map'].get(col)
+            code = -1 if subject is None else codes.setdefault(subject, len(codes))
+            if slots and slots[-2] == code:
+                slots[-1] += 1
+            else:
+                slots += [code, 1]
+
+    return {
+        'month': first.strftime('%Y-%m'),
+        'cols': cols,
+        'subjects': list(codes),
+        'days': [int(day['date'][8:]) for day in days],
+        'special': {i: day['special_label'] for i, day in enumerate(days) if day['is_special']},
+        'slots': slots,
+        'next_month': next_date[:7] if next_date else None,
+    }
+
+
+class LazyTimetable:
+    """
+    Timetable for the streamed result page. The plan is generated the first
+    time an id or summary is asked for; the days themselves are fetched
+    month by month from month_payload by the page.
+    """
+
+    def __init__(self, form_data):
+        self.form_data = form_data
+        self._ids = None
+
+    def _generate(self):
+        if self._ids is None:
+            main_timetable_id, rev_timetable_id, _ = generate_timetables(self.form_data)
+            self._ids = (main_timetable_id, rev_timetable_id)
+        return self._ids
+
+    @property
+    def main_timetable_id(self):
+        return self._generate()[0]
+
+    @property
+    def rev_timetable_id(self):
+        return self._generate()[1]
+
+    def summary(self, is_revision=False):
+        return subject_summary(self._generate()[is_revision], is_revision)
+
+
+def parse_export_range(form):
+    """
+    Optional date range for a partial export: range_from/range_to (YYYY-MM-DD,
+    either may be omitted) or month (YYYY-MM), plus summary=1 to keep the
+    subject breakdown. Returns None when no range was given.
+    Raises ValueError for malformed or reversed dates.
+    """
+    month = form.get('month')
+    range_from = form.get('range_from')
+    range_to = form.get('range_to')
+    if month:
+        first = datetime.strptime(month, '%Y-%m').date()
+        last = first.replace(day=calendar.monthrange(first.year, first.month)[1])
+    elif range_from or range_to:
+        first = datetime.strptime(range_from, '%Y-%m-%d').date() if range_from else None
+        last = datetime.strptime(range_to, '%Y-%m-%d').date() if range_to else None
+        if first and last and first > last:
+            raise ValueError("range_from must not be after range_to")
+    else:
+        return None
+    return {
+        'from': first.isoformat() if first else None,
+        'to': last.isoformat() if last else None,
+        'summary': form.get('summary') in ('1', 'true', 'on'),
+    }
+
+
+def select_range(main_timetable_id, rev_timetable_id, export_range):
+    """
+    The days of both timetables inside export_range, read with the range in
+    the query, with the subject breakdown counted over them (None without
+    summary), and stats describing the selection. Raises ValueError when no
+    day matches.
+    """
+    main_part = process_data_matrix(main_timetable_id, False, export_range['from'], export_range['to'])
+    rev_part = process_data_matrix(rev_timetable_id, True, export_range['from'], export_range['to'])
+    if not main_part['days'] and not rev_part['days']:
+        raise ValueError("No timetable days in the selected range")
+    if not export_range['summary']:
+        main_part['summary'] = rev_part['summary'] = None
+    stats = {
+        'total_days': len(main_part['days']) + len(rev_part['days']),
+        'main_days': len(main_part['days']),
+        'rev_days': len(rev_part['days']),
+    }
+    return main_part, rev_part, stats
+
+
+def export_filename(form_data, export_range=None, ext='pdf'):
+    """Download name covering the plan, or the exported range of it"""
+    first, last = form_data['from_date'], form_data['to_date']
+    if export_range:
+        first = export_range['from'] or first
+        last = export_range['to'] or last
+    return f"NEET_PG_Timetable_{first}_to_{last}.{ext}"
+
+
+def _timetable_stored(timetable_id, is_revision):
+    db_file, id_col = _slots_table(is_revision)
+    with get_db_connection(db_file) as conn:
+        return conn.execute(f"SELECT 1 FROM TimetableSlots WHERE {id_col} = ? LIMIT 1",
+                            (timetable_id,)).fetchone() is not None
+
+
+def _stored_timetables(form_data):
+    """
+    (main_timetable_id, rev_timetable_id) of the already generated plan the
+    form echoes, or None when it names none or its slots are gone.
+    """
+    main_timetable_id, rev_timetable_id = form_data.get('main_id'), form_data.get('rev_id')
+    if not rev_timetable_id or not _timetable_stored(rev_timetable_id, True):
+        return None
+    if plan_stats(form_data)['main_days'] > 0:
+        if not main_timetable_id or not _timetable_stored(main_timetable_id, False):
+            return None
+    else:
+        main_timetable_id = None
+    return main_timetable_id, rev_timetable_id
+
+
+def build_timetable(form_data, export_range=None):
+    """
+    Both timetables as (main_data, rev_data, stats, time_cols). The plan the
+    form echoes is reused when it is still stored, otherwise it is generated.
+    With export_range only the days inside it are read (see select_range,
+    whose ValueError for an empty range is passed on).
+    """
+    stored = _stored_timetables(form_data)
+    if stored:
+        main_timetable_id, rev_timetable_id = stored
+        stats = plan_stats(form_data)
+    else:
+        main_timetable_id, rev_timetable_id, stats = generate_timetables(form_data)
+    if export_range:
+        main_data, rev_data, stats = select_range(main_timetable_id, rev_timetable_id, export_range)
+    else:
+        main_data = process_data_matrix(main_timetable_id, is_revision=False)
+        rev_data = process_data_matrix(rev_timetable_id, is_revision=True)
+    return main_data, rev_data, stats, sorted(form_data['time_slots'])
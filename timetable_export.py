@@ -0,0 +1,127 @@
+"""
+Calendar (ICS) and spreadsheet (CSV) exports of generated timetables.
+
+Both are generators over the stored TimetableSlots rows, read in index
+order (timetable id, date, start time) and written out as they arrive, so a
+two-year plan streams in constant memory without rebuilding the timetable.
+"""
+
+import csv
+import io
+from datetime import datetime, timezone
+
+from models import get_db_connection, TIMETABLE_DB, REV_TIMETABLE_DB
+
+PHASES = (
+    ('Main', TIMETABLE_DB, 'timetable_id'),
+    ('Revision', REV_TIMETABLE_DB, 'rev_timetable_id'),
+)
+
+CSV_HEADER = ['date', 'day', 'start_time', 'end_time', 'subject', 'phase']
+
+
+def iter_slots(main_id, rev_id):
+    """(phase, slot_date, start_time, end_time, subject) for both timetables, in date order"""
+    for (phase, db_file, id_col), timetable_id in zip(PHASES, (main_id, rev_id)):
+        if not timetable_id:
+            continue
+        with get_db_connection(db_file) as conn:
+            rows = conn.execute(
+                f"SELECT slot_date, start_time, end_time, subject FROM TimetableSlots "
+                f"WHERE {id_col} = ? ORDER BY slot_date, start_time",
+                (timetable_id,),
+            )
+            for slot_date, start_time, end_time, subject in rows:
+                yield phase, slot_date, start_time, end_time, subject
+
+
+def iter_blocks(slots):
+    """Merge back-to-back slots of the same subject on the same day into one block"""
+    block = None
+    for phase, slot_date, start_time, end_time, subject in slots:
+        if (block and block[1] == slot_date and block[3] == start_time
+                and block[4] == subject and block[0] == phase):
+            block[3] = end_time
+            continue
+        if block:
+            yield tuple(block)
+        block = [phase, slot_date, start_time, end_time, subject]
+    if block:
+        yield tuple(block)
+
+
+def timetable_exists(main_id, rev_id):
+    """True when at least one of the ids has stored slots"""
+    return next(iter_slots(main_id, rev_id), None) is not None
+
+
+def iter_csv(main_id, rev_id):
+    """CSV text, one row per stored slot"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for phase, slot_date, start_time, end_time, subject in iter_slots(main_id, rev_id):
+        day = datetime.strptime(slot_date, '%Y-%m-%d').strftime('%A')
+        writer.writerow([slot_date, day, start_time, end_time, subject, phase])
+        # Hand rows out in batches rather than one tiny chunk per slot
+        if buffer.tell() > 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ics_text(value):
+    """Escape a TEXT value (RFC 5545 section 3.3.11)"""
+    return (value.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _ics_line(line):
+    """A content line ending in CRLF, folded at 75 octets (RFC 5545 section 3.1)"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never split a UTF-8 sequence: back up over continuation bytes
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        # Continuation lines start with a space, which counts towards their 75
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_time(slot_date, hhmm):
+    # Floating local time: events stay at the study hours in any calendar time zone
+    return slot_date.replace('-', '') + 'T' + hhmm.replace(':', '') + '00'
+
+
+def iter_ics(main_id, rev_id):
+    """iCalendar text, one VEVENT per subject block"""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ("BEGIN:VCALENDAR\r\n"
+           "VERSION:2.0\r\n"
+           "PRODID:-//NEET PG Tools//Timetable//EN\r\n"
+           "CALSCALE:GREGORIAN\r\n"
+           "X-WR-CALNAME:NEET PG Timetable\r\n")
+    lines = []
+    for phase, slot_date, start_time, end_time, subject in iter_blocks(iter_slots(main_id, rev_id)):
+        timetable_id = main_id if phase == 'Main' else rev_id
+        lines.append(''.join(_ics_line(line) for line in (
+            "BEGIN:VEVENT",
+            f"UID:{phase.lower()}-{timetable_id}-{slot_date}-{start_time.replace(':', '')}@neet-pg-tools",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ics_time(slot_date, start_time)}",
+            f"DTEND:{_ics_time(slot_date, end_time)}",
+            f"SUMMARY:{_ics_text(subject)}",
+            f"CATEGORIES:{phase}",
+            "END:VEVENT",
+        )))
+        if len(lines) >= 50:
+            yield ''.join(lines)
+            lines = []
+    lines.append("END:VCALENDAR\r\n")
+    yield ''.join(lines)